@@ -1,5 +1,18 @@
 __all__ = [
+	"datecache",
+	"dedup",
 	"downloader",
+	"downloadstate",
 	"extractor",
+	"fileops",
+	"httpdownload",
+	"metadata",
+	"moveplan",
 	"organizer",
+	"pipeline",
+	"sidecars",
+	"streamer",
+	"uniquenames",
+	"walker",
+	"zipindex",
 ]
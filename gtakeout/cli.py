@@ -2,9 +2,14 @@ import argparse
 import asyncio
 from pathlib import Path
 from rich.console import Console
-from .downloader import download_all
+from .downloader import DOWNLOAD_ENGINES, ENGINE_BROWSER, download_all
+from .httpdownload import MAX_SEGMENTS
 from .extractor import extract_all
-from .organizer import organize_photos
+from .organizer import ENGINE_THREAD, ENGINES, organize_photos
+from .moveplan import apply_plan, build_plan, write_plan
+from .fileops import MODE_MOVE, OUTPUT_MODES
+from .streamer import stream_to_library
+from .pipeline import run_pipeline
 
 console = Console()
 
@@ -26,28 +31,79 @@ def main() -> None:
 	parser = argparse.ArgumentParser(prog="gtakeout", description="Google Takeout helper")
 	sub = parser.add_subparsers(dest="cmd", required=True)
 
-	p_dl = sub.add_parser("download", help="Open Takeout page and download all parts sequentially")
+	p_dl = sub.add_parser("download", help="Open Takeout page and download all parts")
 	p_dl.add_argument("--url", required=True, help="Takeout download page URL")
 	p_dl.add_argument("--download-dir", required=True, type=_ensure_dir, help="Directory to save downloads")
 	p_dl.add_argument("--browser", choices=["chromium", "firefox", "webkit"], default="chromium")
 	p_dl.add_argument("--chrome-profile-dir", type=Path, required=False, help="Use existing Chrome user profile directory for login (e.g. %LOCALAPPDATA%/Google/Chrome/User Data/Default)")
+	p_dl.add_argument("--engine", choices=DOWNLOAD_ENGINES, default=ENGINE_BROWSER, help="browser: let the browser save each archive; http: sign in with the browser, then fetch archives directly")
+	p_dl.add_argument("--parallel", type=int, default=1, help="Archives downloaded at the same time")
+	p_dl.add_argument("--segments", type=int, default=MAX_SEGMENTS, help="http engine: most connections per archive (byte ranges fetched in parallel; 1 = single stream)")
 
 	p_ex = sub.add_parser("extract", help="Extract all ZIPs from download dir")
 	p_ex.add_argument("--download-dir", required=True, type=_existing_dir)
 	p_ex.add_argument("--extract-dir", required=True, type=_ensure_dir)
+	p_ex.add_argument("--workers", type=int, default=None, help="Archives extracted in parallel")
+	p_ex.add_argument("--media-only", action="store_true", help="Extract only photos/videos and their sidecar JSON")
+	p_ex.add_argument("--include", action="append", default=None, help="Extra extension (.ext) or glob (e.g. '*/Album X/*') to extract; repeatable")
+	p_ex.add_argument("--no-resume", action="store_true", help="Ignore extraction journals and extract every entry again")
+	p_ex.add_argument("--split-workers", type=int, default=None, help="Workers per archive, each with its own ZIP handle (default: spread idle workers over large archives)")
 
 	p_org = sub.add_parser("organize", help="Organize photos by EXIF/JSON dates")
 	p_org.add_argument("--source-dir", required=True, type=_existing_dir)
-	p_org.add_argument("--dest-dir", required=True, type=_ensure_dir)
+	p_org.add_argument("--dest-dir", required=True, type=Path)
+	p_org.add_argument("--dedupe", action="store_true", help="Keep one copy of photos duplicated across album folders")
+	p_org.add_argument("--no-cache", action="store_true", help="Do not read or update the date cache in the destination folder")
+	p_org.add_argument("--album-links", action="store_true", help="With --dedupe: hardlink removed copies under Albums/<album>")
+	p_org.add_argument("--mode", choices=OUTPUT_MODES, default=MODE_MOVE, help="How files get into the library; reflink/hardlink/symlink leave the source folder untouched")
+	p_org.add_argument("--engine", choices=ENGINES, default=ENGINE_THREAD, help="Parse dates in worker threads or worker processes (process scales with CPU cores)")
+	p_org.add_argument("--plan-out", type=Path, default=None, help="Only write the move plan (TSV) to this file; run 'apply' to carry it out")
+
+	p_ap = sub.add_parser("apply", help="Carry out a move plan written by 'organize --plan-out' (resumable)")
+	p_ap.add_argument("--plan", required=True, type=Path)
+	p_ap.add_argument("--workers", type=int, default=None, help="Target folders processed in parallel")
+	p_ap.add_argument("--mode", choices=OUTPUT_MODES, default=MODE_MOVE, help="How files get into the library")
+
+	p_dr = sub.add_parser("direct", help="Extract photos from ZIPs straight into Year/Month/Day (no Extracted folder)")
+	p_dr.add_argument("--download-dir", required=True, type=_existing_dir)
+	p_dr.add_argument("--dest-dir", required=True, type=_ensure_dir)
+
+	p_pl = sub.add_parser("pipeline", help="Download, extract and organize with the three stages overlapped")
+	p_pl.add_argument("--url", required=True, help="Takeout download page URL")
+	p_pl.add_argument("--download-dir", required=True, type=_ensure_dir)
+	p_pl.add_argument("--extract-dir", required=True, type=_ensure_dir)
+	p_pl.add_argument("--dest-dir", required=True, type=_ensure_dir)
+	p_pl.add_argument("--browser", choices=["chromium", "firefox", "webkit"], default="chromium")
+	p_pl.add_argument("--chrome-profile-dir", type=Path, required=False)
+	p_pl.add_argument("--engine", choices=DOWNLOAD_ENGINES, default=ENGINE_BROWSER, help="Download engine (see 'download --engine')")
+	p_pl.add_argument("--parallel", type=int, default=1, help="Archives downloaded at the same time")
+	p_pl.add_argument("--segments", type=int, default=MAX_SEGMENTS, help="Connections per archive (see 'download --segments')")
+	p_pl.add_argument("--queue-size", type=int, default=2, help="Archives/batches allowed to wait between stages")
 
 	args = parser.parse_args()
 
 	if args.cmd == "download":
-		asyncio.run(download_all(args.url, args.download_dir, args.browser, chrome_profile_dir=args.chrome_profile_dir))
+		asyncio.run(download_all(args.url, args.download_dir, args.browser, chrome_profile_dir=args.chrome_profile_dir, engine=args.engine, segments=args.segments, parallel=args.parallel))
 	elif args.cmd == "extract":
-		extract_all(args.download_dir, args.extract_dir)
+		extract_all(args.download_dir, args.extract_dir, max_workers=args.workers, split_workers=args.split_workers, resume=not args.no_resume, media_only=args.media_only, include=args.include)
 	elif args.cmd == "organize":
-		organize_photos(args.source_dir, args.dest_dir)
+		if args.plan_out:
+			# Planning only reads; how files are placed is chosen when the plan is applied
+			if args.mode != MODE_MOVE:
+				parser.error("--mode is not used with --plan-out; pass it to 'apply' instead")
+			if args.engine != ENGINE_THREAD:
+				parser.error("--engine is not supported with --plan-out")
+			rows = build_plan(args.source_dir, args.dest_dir, dedupe=args.dedupe, album_links=args.album_links, use_cache=not args.no_cache)
+			write_plan(rows, args.plan_out)
+			console.print(f"[green]Wrote {len(rows)} plan rows to {args.plan_out}[/]")
+		else:
+			organize_photos(args.source_dir, args.dest_dir, dedupe=args.dedupe, album_links=args.album_links, use_cache=not args.no_cache, mode=args.mode, engine=args.engine)
+	elif args.cmd == "apply":
+		apply_plan(args.plan, max_workers=args.workers, mode=args.mode)
+	elif args.cmd == "pipeline":
+		run_pipeline(args.url, args.download_dir, args.extract_dir, args.dest_dir, args.browser, chrome_profile_dir=args.chrome_profile_dir, queue_size=args.queue_size, download_engine=args.engine, download_segments=args.segments, download_parallel=args.parallel)
+	elif args.cmd == "direct":
+		stream_to_library(args.download_dir, args.dest_dir)
 	else:
 		raise SystemExit(1)
 
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+DATECACHE_FILENAME = ".gtakeout-dates.sqlite"
+FLUSH_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dates (
+	path TEXT PRIMARY KEY,
+	size INTEGER NOT NULL,
+	mtime_ns INTEGER NOT NULL,
+	taken TEXT NOT NULL,
+	source TEXT NOT NULL
+);
+"""
+
+
+class DateCache:
+	# (path, size, mtime) -> resolved date and where it came from ("exif", "container", "sidecar", "mtime").
+	# A changed size or mtime is a miss, so edited files are parsed again.
+	def __init__(self, db_path: Path, read_only: bool = False) -> None:
+		self.db_path = Path(db_path)
+		# Read-only (planning): lookups only, put() is dropped and nothing on disk changes
+		self.read_only = read_only
+		if read_only:
+			# immutable: no -wal/-shm files either (entries still in an uncheckpointed WAL are just misses)
+			self._conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+		else:
+			self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+			self._conn.execute("PRAGMA journal_mode=WAL")
+			self._conn.execute("PRAGMA synchronous=NORMAL")
+			self._conn.executescript(_SCHEMA)
+		self._lock = threading.Lock()
+		self._pending: List[Tuple[str, int, int, str, str]] = []
+
+	@classmethod
+	def for_dir(cls, dest_dir: Path, read_only: bool = False) -> "DateCache":
+		return cls(Path(dest_dir) / DATECACHE_FILENAME, read_only)
+
+	def get(self, path: str, size: int, mtime_ns: int) -> Optional[Tuple[datetime, str]]:
+		try:
+			with self._lock:
+				row = self._conn.execute("SELECT size, mtime_ns, taken, source FROM dates WHERE path = ?", (path,)).fetchone()
+		except sqlite3.Error:
+			if not self.read_only:
+				raise
+			return None  # e.g. no dates table yet
+		if not row or row[0] != size or row[1] != mtime_ns:
+			return None
+		try:
+			return (datetime.fromisoformat(row[2]), row[3])
+		except ValueError:
+			return None
+
+	def put(self, path: str, size: int, mtime_ns: int, taken: datetime, source: str) -> None:
+		if self.read_only:
+			return
+		with self._lock:
+			self._pending.append((path, size, mtime_ns, taken.isoformat(), source))
+			if len(self._pending) >= FLUSH_EVERY:
+				self._flush_locked()
+
+	def _flush_locked(self) -> None:
+		if not self._pending:
+			return
+		with self._conn:
+			self._conn.executemany("INSERT OR REPLACE INTO dates(path, size, mtime_ns, taken, source) VALUES (?, ?, ?, ?, ?)", self._pending)
+		self._pending = []
+
+	def flush(self) -> None:
+		with self._lock:
+			self._flush_locked()
+
+	def close(self) -> None:
+		with self._lock:
+			self._flush_locked()
+			self._conn.close()
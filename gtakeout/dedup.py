@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PARTIAL_BYTES = 64 * 1024
+HASH_BUFFER = 1024 * 1024
+
+# Takeout's per-year folders hold the canonical copy; albums hold the duplicates
+_YEAR_FOLDER = re.compile(r"^(Photos from|Fotos de|Fotos von|Photos de) \d{4}$", re.IGNORECASE)
+
+
+def _partial_hash(path: Path) -> bytes:
+	# First and last PARTIAL_BYTES: cheap and enough to split most same-size groups
+	h = hashlib.blake2b(digest_size=16)
+	with open(path, "rb") as f:
+		h.update(f.read(PARTIAL_BYTES))
+		size = os.fstat(f.fileno()).st_size
+		if size > PARTIAL_BYTES:
+			f.seek(max(PARTIAL_BYTES, size - PARTIAL_BYTES))
+			h.update(f.read(PARTIAL_BYTES))
+	return h.digest()
+
+
+def _full_hash(path: Path) -> bytes:
+	h = hashlib.blake2b(digest_size=32)
+	with open(path, "rb") as f:
+		while True:
+			buf = f.read(HASH_BUFFER)
+			if not buf:
+				break
+			h.update(buf)
+	return h.digest()
+
+
+def _refine(groups: List[List[Path]], key_fn: Callable[[Path], bytes], executor: ThreadPoolExecutor) -> List[List[Path]]:
+	flat = [p for g in groups for p in g]
+	keys = dict(zip(flat, executor.map(_safe_key(key_fn), flat)))
+	out: List[List[Path]] = []
+	for g in groups:
+		buckets: Dict[bytes, List[Path]] = defaultdict(list)
+		for p in g:
+			k = keys[p]
+			if k is not None:
+				buckets[k].append(p)
+		out.extend(b for b in buckets.values() if len(b) > 1)
+	return out
+
+
+def _safe_key(key_fn: Callable[[Path], bytes]) -> Callable[[Path], Optional[bytes]]:
+	def _wrapped(p: Path) -> Optional[bytes]:
+		try:
+			return key_fn(p)
+		except OSError:
+			return None
+	return _wrapped
+
+
+def find_duplicates(
+	paths: Iterable[Path],
+	max_workers: Optional[int] = None,
+	sizes: Optional[Dict[Path, int]] = None,
+) -> List[List[Path]]:
+	# size -> partial hash -> full hash; each stage only looks at what the previous one
+	# could not tell apart, so unique files are never read at all.
+	by_size: Dict[int, List[Path]] = defaultdict(list)
+	size_of: Dict[Path, int] = {}
+	for p in paths:
+		try:
+			size = sizes[p] if sizes and p in sizes else p.stat().st_size
+		except OSError:
+			continue
+		if size > 0:
+			by_size[size].append(p)
+			size_of[p] = size
+	groups = [g for g in by_size.values() if len(g) > 1]
+	if not groups:
+		return []
+	if max_workers is None:
+		max_workers = max(2, min(8, os.cpu_count() or 2))
+	with ThreadPoolExecutor(max_workers=max_workers) as executor:
+		groups = _refine(groups, _partial_hash, executor)
+		# Files no bigger than the partial window were hashed completely already
+		small = [g for g in groups if size_of[g[0]] <= 2 * PARTIAL_BYTES]
+		large = [g for g in groups if size_of[g[0]] > 2 * PARTIAL_BYTES]
+		groups = small + _refine(large, _full_hash, executor)
+	return groups
+
+
+def is_year_folder(name: str) -> bool:
+	# Takeout's "Photos from 2020" folders are the timeline, not an album
+	return bool(_YEAR_FOLDER.match(name))
+
+
+def pick_keeper(group: List[Path]) -> Tuple[Path, List[Path]]:
+	# Prefer the copy in a "Photos from YYYY" folder, then the shortest path
+	ordered = sorted(group, key=lambda p: (not _YEAR_FOLDER.match(p.parent.name), len(str(p)), str(p)))
+	return ordered[0], ordered[1:]
@@ -4,66 +4,40 @@ import asyncio
 import os
 import subprocess
 import sys
-import json
 from pathlib import Path
-from typing import List, Optional, Set, Dict, Any, Callable
+from urllib.parse import urljoin
+from typing import List, NamedTuple, Optional, Set, Dict, Any, Callable, Tuple
 from rich.console import Console
 from rich.progress import Progress
 from playwright.async_api import async_playwright, Page, BrowserContext
 
+from .downloadstate import CancelToken, DownloadProgress, DownloadState, archive_complete
+from .httpdownload import MAX_SEGMENTS, download_targets, session_from_cookies
+
 console = Console(force_terminal=True, legacy_windows=False)
 
 
 ProgressCallback = Callable[[Dict[str, Any]], None]
 
+# browser: Chrome clicks every button and its download manager saves the file.
+# http: the browser is only used to sign in; archives are fetched with its cookies.
+ENGINE_BROWSER = "browser"
+ENGINE_HTTP = "http"
+DOWNLOAD_ENGINES = (ENGINE_BROWSER, ENGINE_HTTP)
 
-class CancelToken:
-	def __init__(self) -> None:
-		self._cancelled = False
-
-	def cancel(self) -> None:
-		self._cancelled = True
-
-	@property
-	def is_cancelled(self) -> bool:
-		return self._cancelled
-
-
-class DownloadState:
-	def __init__(self, state_path: Path) -> None:
-		self.state_path = state_path
-		self.completed_keys: Set[str] = set()
-		self.completed_files: Set[str] = set()
-		self._loaded = False
-
-	def load(self) -> None:
-		if self.state_path.exists():
-			try:
-				data = json.loads(self.state_path.read_text(encoding="utf-8"))
-				self.completed_keys = set(data.get("completed_keys", []))
-				self.completed_files = set(data.get("completed_files", []))
-				self._loaded = True
-			except Exception:
-				self._loaded = True
-		else:
-			self._loaded = True
+# The browser writes in-flight downloads here (inside the ZIPs folder) so their growing
+# size can be sampled for live progress; each is deleted once saved under its real name
+BROWSER_TMP_DIRNAME = ".browser-downloads"
 
-	def save(self) -> None:
-		data: Dict[str, Any] = {
-			"completed_keys": sorted(self.completed_keys),
-			"completed_files": sorted(self.completed_files),
-		}
-		self.state_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
 
-	def mark_completed(self, key: Optional[str], filename: Optional[str]) -> None:
-		if key:
-			self.completed_keys.add(key)
-		if filename:
-			self.completed_files.add(filename)
-		self.save()
+class _Target(NamedTuple):
+	key: str  # "<selector>:<index>:<href>", the id kept in downloads_state.json
+	selector: str
+	index: int
+	href: Optional[str]
 
 
-async def _collect_download_targets(page: Page) -> List[str]:
+async def _collect_download_targets(page: Page) -> List[_Target]:
 	# Collect clickable elements likely to trigger downloads, in DOM order
 	selectors = [
 		"a[download]",
@@ -75,7 +49,7 @@ async def _collect_download_targets(page: Page) -> List[str]:
 		"a[href$='.zip']",
 	]
 	seen = set()
-	targets: List[str] = []
+	targets: List[_Target] = []
 	for sel in selectors:
 		loc = page.locator(sel)
 		count = await loc.count()
@@ -89,19 +63,80 @@ async def _collect_download_targets(page: Page) -> List[str]:
 			if key in seen:
 				continue
 			seen.add(key)
-			targets.append(key)
+			targets.append(_Target(key, sel, i, href))
 	return targets
 
 
-async def _click_target(page: Page, key: str) -> None:
+def _http_targets(page_url: str, targets: List[_Target]) -> List[Tuple[str, str]]:
+	# (key, absolute URL) for every target that has a real link, one entry per URL;
+	# buttons without an href are only reachable by clicking
+	seen: Set[str] = set()
+	out: List[Tuple[str, str]] = []
+	for t in targets:
+		href = (t.href or "").strip()
+		if not href or href.startswith(("javascript:", "#")):
+			continue
+		url = urljoin(page_url, href)
+		if url in seen:
+			continue
+		seen.add(url)
+		out.append((t.key, url))
+	return out
+
+
+async def _click_target(page: Page, target: _Target) -> None:
 	# Re-materialize the element by index per selector
-	sel, idx, _ = key.split(":", 2)
-	idx = int(idx)
-	elem = page.locator(sel).nth(idx)
+	elem = page.locator(target.selector).nth(target.index)
 	await elem.scroll_into_view_if_needed()
 	await elem.click(delay=50)
 
 
+async def _open_slot_page(context: BrowserContext, url: str) -> Page:
+	# Another tab on the signed-in Manage archive page, with the same buttons in the same order
+	page = await context.new_page()
+	await page.goto(url)
+	for _ in range(40):
+		if await _collect_download_targets(page):
+			break
+		await page.wait_for_timeout(500)
+	return page
+
+
+def _dir_bytes(path: Path) -> int:
+	total = 0
+	try:
+		with os.scandir(path) as it:
+			for e in it:
+				try:
+					if e.is_file():
+						total += e.stat().st_size
+				except OSError:
+					continue
+	except OSError:
+		pass
+	return total
+
+
+async def _save_download(page: Page, target: _Target, download_path: Path, resume: bool) -> Tuple[str, bool]:
+	# Returns (file name, skipped)
+	async with page.expect_download() as download_info:
+		await _click_target(page, target)
+	download = await download_info.value
+	suggested = download.suggested_filename or "download.zip"
+	dest_file = download_path / suggested
+	if resume and archive_complete(dest_file):
+		await download.cancel()
+		await download.delete()
+		return (suggested, True)
+	# The browser owns the transfer (no Range resume here); the file only gets its real
+	# name once the browser reports it finished
+	part = dest_file.with_name(dest_file.name + ".part")
+	await download.save_as(str(part))
+	await download.delete()
+	os.replace(part, dest_file)
+	return (suggested, False)
+
+
 def _ensure_persistent_browsers_path() -> None:
 	# When frozen (PyInstaller), Playwright defaults under a temp folder that gets deleted.
 	# Force a persistent per-user path so browsers survive across runs.
@@ -129,6 +164,8 @@ def _install_browsers_programmatically(target_browser: str) -> None:
 
 async def _prepare_context(browser: str, download_dir: Path, user_profile_dir: Optional[Path] = None) -> BrowserContext:
 	_ensure_persistent_browsers_path()
+	downloads_tmp = Path(download_dir) / BROWSER_TMP_DIRNAME
+	downloads_tmp.mkdir(parents=True, exist_ok=True)
 	p = await async_playwright().start()
 	async def _launch() -> BrowserContext:
 		if browser == "firefox":
@@ -167,6 +204,7 @@ async def _prepare_context(browser: str, download_dir: Path, user_profile_dir: O
 					executable_path=chrome_executable,
 					headless=False,
 					accept_downloads=True,
+					downloads_path=str(downloads_tmp),
 					args=launch_args,
 				)
 				return context
@@ -177,6 +215,7 @@ async def _prepare_context(browser: str, download_dir: Path, user_profile_dir: O
 					channel="chrome",
 					headless=False,
 					accept_downloads=True,
+					downloads_path=str(downloads_tmp),
 					args=launch_args,
 				)
 				return context
@@ -184,6 +223,7 @@ async def _prepare_context(browser: str, download_dir: Path, user_profile_dir: O
 			# Final fallback to bundled Chromium
 			browser_obj = await p.chromium.launch(
 				headless=False,
+				downloads_path=str(downloads_tmp),
 				args=["--disable-blink-features=AutomationControlled", "--disable-web-security"]
 			)
 			context = await browser_obj.new_context(accept_downloads=True)
@@ -207,6 +247,44 @@ async def _prepare_context(browser: str, download_dir: Path, user_profile_dir: O
 		return await _launch()
 
 
+async def _download_http(
+	page: Page,
+	context: BrowserContext,
+	targets: List[_Target],
+	download_path: Path,
+	state: DownloadState,
+	cancel: Optional[CancelToken],
+	resume: bool,
+	progress_cb: Optional[ProgressCallback],
+	segments: int = MAX_SEGMENTS,
+	parallel: int = 1,
+	progress_hz: float = 5.0,
+) -> None:
+	http_targets = _http_targets(page.url, targets)
+	cookies = await context.cookies()
+	try:
+		user_agent = await page.evaluate("navigator.userAgent")
+	except Exception:
+		user_agent = None
+	# Signed in: the browser is not needed for the transfers
+	await context.close()
+	if progress_cb:
+		progress_cb({"phase": "download", "event": "start", "total_files": len(http_targets), "completed_files": len(state.completed_keys), "bytes_total": None, "bytes_completed": state.completed_bytes(download_path)})
+	if not http_targets:
+		console.print("[yellow]No download links found after waiting. Check the URL or sign-in status, then try again.[/]")
+	else:
+		console.rule("Downloading archives")
+		session = session_from_cookies(cookies, user_agent, pool_size=max(1, parallel) * max(1, segments))
+		try:
+			# Blocking transfers run off the event loop
+			await asyncio.to_thread(download_targets, http_targets, download_path, session, state, progress_cb, cancel, resume, segments, parallel, progress_hz)
+		finally:
+			session.close()
+	if progress_cb:
+		progress_cb({"phase": "download", "event": "end"})
+	console.print("[green]Download session finished.[/]")
+
+
 async def download_all(
 	url: str,
 	download_dir: Path,
@@ -215,6 +293,10 @@ async def download_all(
 	resume: bool = True,
 	progress_cb: Optional[ProgressCallback] = None,
 	chrome_profile_dir: Optional[Path] = None,
+	engine: str = ENGINE_BROWSER,
+	segments: int = MAX_SEGMENTS,
+	parallel: int = 1,
+	progress_hz: float = 5.0,
 ) -> None:
 	download_path = Path(download_dir)
 	download_path.mkdir(parents=True, exist_ok=True)
@@ -224,7 +306,8 @@ async def download_all(
 	state.load()
 	# Seed completed files from disk (helps after app restarts)
 	for p in download_path.glob("*.zip"):
-		state.completed_files.add(p.name)
+		if archive_complete(p):
+			state.completed_files.add(p.name)
 	state.save()
 
 	context = await _prepare_context(browser, download_path, chrome_profile_dir)
@@ -237,7 +320,7 @@ async def download_all(
 		await page.goto(url)
 		console.print("If prompted, please sign in to Google in the opened browser window.")
 	# Wait for user sign-in and page to show downloadable links (poll up to ~10 minutes)
-		targets: List[str] = []
+		targets: List[_Target] = []
 		max_wait_ms = 10 * 60 * 1000
 		poll_ms = 1500
 		waited = 0
@@ -279,9 +362,13 @@ async def download_all(
 		# Exit attempt loop when we have targets or max wait elapsed
 		break
 
+	if engine == ENGINE_HTTP:
+		await _download_http(page, context, targets, download_path, state, cancel, resume, progress_cb, segments, parallel, progress_hz)
+		return
+
 	total_files = len(targets)
 	if progress_cb:
-		progress_cb({"phase": "download", "event": "start", "total_files": total_files, "completed_files": len(state.completed_keys), "bytes_total": None, "bytes_completed": sum((download_path / f).stat().st_size for f in state.completed_files if (download_path / f).exists())})
+		progress_cb({"phase": "download", "event": "start", "total_files": total_files, "completed_files": len(state.completed_keys), "bytes_total": None, "bytes_completed": state.completed_bytes(download_path)})
 	if not targets:
 		console.print("[yellow]No download links found after waiting. Check the URL or sign-in status, then try again.[/]")
 		await context.close()
@@ -291,10 +378,9 @@ async def download_all(
 	with Progress() as progress:
 		task = progress.add_task("Downloading...", total=total_files)
 		completed_count = 0
-		for key in targets:
-			if cancel and cancel.is_cancelled:
-				console.print("[yellow]Download paused/cancelled by user.[/]")
-				break
+		pending: "asyncio.Queue[_Target]" = asyncio.Queue()
+		for target in targets:
+			key = target.key
 			# Skip already completed keys when resuming
 			if resume and key in state.completed_keys:
 				completed_count += 1
@@ -302,33 +388,66 @@ async def download_all(
 				if progress_cb:
 					progress_cb({"phase": "download", "event": "file_skipped", "key": key, "completed_files": completed_count, "total_files": total_files})
 				continue
-			try:
-				async with page.expect_download() as download_info:
-					await _click_target(page, key)
-				download = await download_info.value
-				suggested = download.suggested_filename or "download.zip"
-				dest_file = download_path / suggested
-				if resume and dest_file.exists():
+			pending.put_nowait(target)
+		meter = DownloadProgress(progress_cb, pending.qsize(), rate_hz=progress_hz) if progress_cb else None
+		saved_bytes = 0  # parts finished (or found complete) this run
+
+		async def _sample() -> None:
+			# The browser does not report progress; its temporary files grow as data arrives
+			while meter:
+				await asyncio.sleep(1.0 / max(0.1, progress_hz))
+				meter.set_transferred(saved_bytes + _dir_bytes(download_path / BROWSER_TMP_DIRNAME))
+
+		async def _slot(slot_page: Page) -> None:
+			# One page per slot: each waits for its own download. A slot takes the next
+			# part as soon as its current one is saved.
+			nonlocal completed_count, saved_bytes
+			while not pending.empty():
+				if cancel and cancel.is_cancelled:
+					return
+				target = pending.get_nowait()
+				key = target.key
+				state.mark_started(key)
+				try:
+					suggested, skipped = await _save_download(slot_page, target, download_path, resume)
 					state.mark_completed(key, suggested)
 					completed_count += 1
+					if meter:
+						size = (download_path / suggested).stat().st_size
+						meter.part_size(key, size, on_disk=size if skipped else 0)
+						if not skipped:
+							saved_bytes += size
+							meter.set_transferred(saved_bytes)
+						meter.flush()
 					progress.update(task, completed=completed_count)
 					if progress_cb:
-						progress_cb({"phase": "download", "event": "file_complete", "filename": suggested, "completed_files": completed_count, "total_files": total_files, "bytes_completed": sum((download_path / f).stat().st_size for f in state.completed_files if (download_path / f).exists())})
-					continue
-				filepath = await download.path()
-				await download.save_as(str(dest_file))
-				state.mark_completed(key, suggested)
-				completed_count += 1
-				progress.update(task, completed=completed_count)
-				if progress_cb:
-					progress_cb({"phase": "download", "event": "file_complete", "filename": suggested, "completed_files": completed_count, "total_files": total_files, "bytes_completed": sum((download_path / f).stat().st_size for f in state.completed_files if (download_path / f).exists())})
+						# Off the loop: a consumer may block on this event to push back (the pipeline
+						# does while extraction is saturated). Only this slot waits; the other pages
+						# and the sampler keep running.
+						await asyncio.to_thread(progress_cb, {"phase": "download", "event": "file_complete", "filename": suggested, "completed_files": completed_count, "total_files": total_files, "bytes_completed": state.completed_bytes(download_path)})
+				except Exception as e:
+					state.mark_failed(key, str(e))
+					console.print(f"[red]Failed to download for target {key}: {e}[/]")
+					if progress_cb:
+						progress_cb({"phase": "download", "event": "file_error", "key": key, "error": str(e)})
+				finally:
+					await asyncio.sleep(0)
+
+		slot_pages = [page]
+		for _ in range(min(max(1, parallel), pending.qsize()) - 1):
+			try:
+				slot_pages.append(await _open_slot_page(context, page.url))
 			except Exception as e:
-				console.print(f"[red]Failed to download for target {key}: {e}[/]")
-				if progress_cb:
-					progress_cb({"phase": "download", "event": "file_error", "key": key, "error": str(e)})
-				continue
-			finally:
-				await asyncio.sleep(0)
+				console.print(f"[yellow]Could not open another download page, continuing with {len(slot_pages)}: {e}[/]")
+				break
+		sampler = asyncio.create_task(_sample()) if meter else None
+		try:
+			await asyncio.gather(*(_slot(p) for p in slot_pages))
+		finally:
+			if sampler:
+				sampler.cancel()
+		if cancel and cancel.is_cancelled:
+			console.print("[yellow]Download paused/cancelled by user.[/]")
 
 	await context.close()
 	if progress_cb:
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+from .utils import ProgressThrottle
+
+# Per-part status in DownloadState.parts
+PART_ACTIVE = "active"
+PART_COMPLETE = "complete"
+PART_FAILED = "failed"
+
+
+class CancelToken:
+	def __init__(self) -> None:
+		self._cancelled = False
+
+	def cancel(self) -> None:
+		self._cancelled = True
+
+	@property
+	def is_cancelled(self) -> bool:
+		return self._cancelled
+
+
+class DownloadState:
+	def __init__(self, state_path: Path) -> None:
+		self.state_path = state_path
+		self.completed_keys: Set[str] = set()
+		self.completed_files: Set[str] = set()
+		# key -> {"status", "filename", "bytes", "error"}; several parts can be active at once
+		self.parts: Dict[str, Dict[str, Any]] = {}
+		self._lock = threading.RLock()
+		self._loaded = False
+
+	def load(self) -> None:
+		if self.state_path.exists():
+			try:
+				data = json.loads(self.state_path.read_text(encoding="utf-8"))
+				self.completed_keys = set(data.get("completed_keys", []))
+				self.completed_files = set(data.get("completed_files", []))
+				self.parts = dict(data.get("parts", {}))
+				# Parts that were in flight when the last run stopped are not in flight now
+				for part in self.parts.values():
+					if part.get("status") == PART_ACTIVE:
+						part["status"] = PART_FAILED
+						part["error"] = "interrupted"
+				self._loaded = True
+			except Exception:
+				self._loaded = True
+		else:
+			self._loaded = True
+
+	def save(self) -> None:
+		with self._lock:
+			data: Dict[str, Any] = {
+				"completed_keys": sorted(self.completed_keys),
+				"completed_files": sorted(self.completed_files),
+				"parts": self.parts,
+			}
+			# Parallel downloads save from several threads: write aside, then swap in
+			tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+			tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+			os.replace(tmp, self.state_path)
+
+	def _part(self, key: str) -> Dict[str, Any]:
+		return self.parts.setdefault(key, {"status": PART_ACTIVE, "filename": None, "bytes": 0, "error": None})
+
+	def mark_started(self, key: str, filename: Optional[str] = None) -> None:
+		with self._lock:
+			part = self._part(key)
+			part.update(status=PART_ACTIVE, error=None, bytes=0)
+			if filename:
+				part["filename"] = filename
+			self.save()
+
+	def add_bytes(self, key: str, n: int) -> None:
+		# In memory only; written with the next status change
+		with self._lock:
+			self._part(key)["bytes"] += n
+
+	def mark_failed(self, key: str, error: str) -> None:
+		with self._lock:
+			self._part(key).update(status=PART_FAILED, error=error)
+			self.save()
+
+	def mark_completed(self, key: Optional[str], filename: Optional[str]) -> None:
+		with self._lock:
+			if key:
+				self.completed_keys.add(key)
+				part = self._part(key)
+				part.update(status=PART_COMPLETE, error=None)
+				if filename:
+					part["filename"] = filename
+			if filename:
+				self.completed_files.add(filename)
+			self.save()
+
+	def completed_bytes(self, download_dir: Path) -> int:
+		return sum((download_dir / f).stat().st_size for f in self.completed_files if (download_dir / f).exists())
+
+
+class DownloadProgress:
+	# Byte counts for the parts this run downloads, reported as throttled "bytes_progress"
+	# events: bytes_done is what is on disk (resumed data included), bytes_transferred only
+	# what came over the network this run (for speed). bytes_total is known sizes plus their
+	# average for parts whose size is not known yet, so it is an estimate until all have started.
+	def __init__(self, progress_cb: Callable[[Dict[str, Any]], None], parts: int, rate_hz: float = 5.0) -> None:
+		self._progress_cb = progress_cb
+		self.parts = parts
+		self.sizes: Dict[str, int] = {}
+		self.on_disk = 0
+		self._lock = threading.Lock()
+		self._throttle = ProgressThrottle(self._emit, rate_hz=rate_hz)
+
+	def part_size(self, key: str, size: int, on_disk: int = 0) -> None:
+		with self._lock:
+			if size >= 0:
+				self.sizes[key] = size
+			self.on_disk += on_disk
+
+	def add(self, n: int) -> None:
+		self._throttle.add(n)
+
+	def set_transferred(self, total: int) -> None:
+		# For sources that can only be sampled (the browser's temporary files)
+		delta = total - self._throttle.total
+		if delta > 0:
+			self._throttle.add(delta)
+
+	def flush(self) -> None:
+		self._throttle.flush()
+
+	def estimated_total(self) -> Optional[int]:
+		with self._lock:
+			if not self.sizes:
+				return None
+			known = sum(self.sizes.values())
+			unknown = max(0, self.parts - len(self.sizes))
+			return known + unknown * known // len(self.sizes)
+
+	def _emit(self, transferred: int) -> None:
+		done = self.on_disk + transferred
+		total = self.estimated_total()
+		self._progress_cb({"phase": "download", "event": "bytes_progress", "bytes_done": done, "bytes_total": max(total, done) if total is not None else None, "bytes_transferred": transferred})
+
+
+def archive_complete(path: Path, expected_size: int = -1) -> bool:
+	# A file left behind by an interrupted run must not count as downloaded
+	try:
+		size = path.stat().st_size
+	except OSError:
+		return False
+	if expected_size >= 0:
+		return size == expected_size
+	if path.suffix.lower() == ".zip":
+		# The central directory sits at the very end, so a truncated ZIP fails this
+		return zipfile.is_zipfile(path)
+	return size > 0
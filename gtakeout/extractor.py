@@ -5,13 +5,130 @@ from pathlib import Path
 from typing import Iterable, Optional, Callable, Dict, Any, List, Tuple
 from rich.console import Console
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from .utils import BoundedSubmitter, ProgressThrottle, format_bytes
+from .organizer import MEDIA_EXTS
+from .zipindex import ZipIndex, IndexEntry, _entry_from_info
+import bisect
+import fnmatch
+import heapq
+import json
 import os
+import posixpath
+import shutil
+import threading
+import time
+import zlib
 
 console = Console()
 
 ProgressCallback = Callable[[Dict[str, Any]], None]
+BytesCallback = Callable[[int], None]
+
+COPY_BUFFER = 1024 * 1024
+_WINDOWS_ILLEGAL = str.maketrans({c: "_" for c in ':<>|"?*'})
+
+
+class ExtractJournal:
+	# Append-only record of the entries of one archive that are fully on disk.
+	# Lives next to the ZIP as "<name>.zip.journal"; one JSON object per line.
+	def __init__(self, journal_path: Path, archive: Path, extract_dir: Path, selection: str = "") -> None:
+		self.journal_path = journal_path
+		self.archive = archive
+		self.extract_dir = extract_dir
+		self.selection = selection
+		self.done: Dict[str, Tuple[int, int]] = {}
+		# entry -> where it was written, relative to extract_dir, when that is not its own path
+		self.targets: Dict[str, str] = {}
+		self.complete = False
+		self._fh = None
+		self._lock = threading.Lock()
+
+	@classmethod
+	def for_archive(cls, archive: Path, extract_dir: Path, selection: str = "") -> "ExtractJournal":
+		return cls(archive.with_name(archive.name + ".journal"), archive, extract_dir, selection)
+
+	def _signature(self) -> Dict[str, Any]:
+		st = self.archive.stat()
+		sig: Dict[str, Any] = {"archive_size": st.st_size, "archive_mtime": int(st.st_mtime), "extract_dir": str(self.extract_dir.resolve())}
+		if self.selection:
+			sig["selection"] = self.selection
+		return sig
+
+	def load(self) -> None:
+		if not self.journal_path.exists():
+			return
+		try:
+			with self.journal_path.open("r", encoding="utf-8") as f:
+				header = json.loads(f.readline() or "{}")
+				if header != self._signature():
+					# Archive replaced (e.g. re-downloaded) or a different target; old progress is meaningless
+					return
+				for line in f:
+					try:
+						rec = json.loads(line)
+					except Exception:
+						break  # torn last line after a crash
+					if rec.get("complete"):
+						self.complete = True
+					elif "n" in rec:
+						self.done[rec["n"]] = (int(rec["s"]), int(rec["c"]))
+						if "t" in rec:
+							self.targets[rec["n"]] = rec["t"]
+		except Exception:
+			self.done = {}
+			self.targets = {}
+			self.complete = False
+
+	def open(self) -> None:
+		fresh = not self.done and not self.complete
+		self._fh = self.journal_path.open("w" if fresh else "a", encoding="utf-8")
+		if fresh:
+			self._fh.write(json.dumps(self._signature()) + "\n")
+			self._fh.flush()
+
+	def close(self) -> None:
+		if self._fh:
+			self._fh.close()
+			self._fh = None
+
+	def is_done(self, info: zipfile.ZipInfo, target: Path) -> bool:
+		rec = self.done.get(info.filename)
+		if rec is None or rec != (info.file_size, info.CRC):
+			return False
+		try:
+			return target.stat().st_size == info.file_size
+		except OSError:
+			return False
+
+	def mark_done(self, info: zipfile.ZipInfo, target: Optional[str] = None) -> None:
+		with self._lock:
+			self.done[info.filename] = (info.file_size, info.CRC)
+			rec: Dict[str, Any] = {"n": info.filename, "s": info.file_size, "c": info.CRC}
+			if target is not None:
+				self.targets[info.filename] = target
+				rec["t"] = target
+			if self._fh:
+				self._fh.write(json.dumps(rec) + "\n")
+				self._fh.flush()
+
+	def mark_complete(self) -> None:
+		with self._lock:
+			self.complete = True
+			if self._fh:
+				self._fh.write(json.dumps({"complete": True}) + "\n")
+				self._fh.flush()
+
+
+def _file_crc32(path: Path) -> int:
+	crc = 0
+	with open(path, "rb") as f:
+		while True:
+			buf = f.read(COPY_BUFFER)
+			if not buf:
+				break
+			crc = zlib.crc32(buf, crc)
+	return crc
 
 
 def _iter_zip_files(root: Path) -> Iterable[Path]:
@@ -19,24 +136,214 @@ def _iter_zip_files(root: Path) -> Iterable[Path]:
 		yield p
 
 
-def _calc_archive_sizes(archives: List[Path]) -> List[Tuple[Path, int]]:
+def _sidecar_stem(json_name: str) -> str:
+	# "IMG_1.jpg.json" / "IMG_1.jpg(1).json" / "IMG_1.jpg.supplemental-metadata.json" /
+	# a name truncated by Takeout -> the leading part every matching media name starts with
+	base = json_name[:-len(".json")]
+	return base.split(".", 1)[0].split("(", 1)[0].lower()
+
+
+def select_entries(
+	archive_entries: Dict[Path, List[IndexEntry]],
+	exts: Optional[Iterable[str]] = None,
+	globs: Optional[Iterable[str]] = None,
+) -> Dict[Path, List[IndexEntry]]:
+	# Keep entries whose extension is in exts or whose path matches one of globs, plus the
+	# JSON sidecars that belong to a kept entry in the same folder of any archive: Takeout
+	# often puts a photo and its JSON in different parts.
+	ext_set = {e.lower() if e.startswith(".") else "." + e.lower() for e in (exts or [])}
+	glob_list = [g.lower() for g in (globs or [])]
+	kept: Dict[Path, List[IndexEntry]] = {}
+	jsons: List[Tuple[Path, IndexEntry]] = []
+	kept_stems: Dict[str, List[str]] = {}
+	for z, entries in archive_entries.items():
+		kept[z] = []
+		for e in entries:
+			if e.is_dir:
+				continue
+			lname = e.name.lower()
+			ext = posixpath.splitext(lname)[1]
+			if ext in ext_set or any(fnmatch.fnmatchcase(lname, g) for g in glob_list):
+				kept[z].append(e)
+				folder, fname = posixpath.split(lname)
+				kept_stems.setdefault(folder, []).append(fname)
+			elif ext == ".json":
+				jsons.append((z, e))
+	for names in kept_stems.values():
+		names.sort()
+	for z, e in jsons:
+		folder, fname = posixpath.split(e.name)
+		names = kept_stems.get(folder.lower())
+		if not names:
+			continue
+		stem = _sidecar_stem(fname)
+		i = bisect.bisect_left(names, stem)
+		if stem and i < len(names) and names[i].startswith(stem):
+			kept[z].append(e)
+	return kept
+
+
+def _calc_archive_sizes(archives: List[Path], index: Optional[ZipIndex] = None) -> List[Tuple[Path, int]]:
 	sizes: List[Tuple[Path, int]] = []
 	for z in archives:
 		try:
-			with zipfile.ZipFile(z, 'r') as zf:
-				total = sum(i.file_size for i in zf.infolist())
+			if index is not None:
+				total = index.total_size(z)
+			else:
+				with zipfile.ZipFile(z, 'r') as zf:
+					total = sum(i.file_size for i in zf.infolist())
 			sizes.append((z, total))
 		except Exception:
 			sizes.append((z, 0))
 	return sizes
 
 
-def _extract_archive(z: Path, extract_dir: Path) -> Tuple[str, int]:
-	bytes_done = 0
+def _safe_target(extract_dir: Path, name: str) -> Path:
+	# Same sanitizing rules as ZipFile.extract: no drive, no absolute paths, no '..'
+	arcname = name.replace("/", os.path.sep)
+	if os.path.altsep:
+		arcname = arcname.replace(os.path.altsep, os.path.sep)
+	arcname = os.path.splitdrive(arcname)[1]
+	parts = [x for x in arcname.split(os.path.sep) if x not in ("", os.path.curdir, os.path.pardir)]
+	if os.path.sep == "\\":
+		parts = [x.translate(_WINDOWS_ILLEGAL).rstrip(". ") or "_" for x in parts]
+	return extract_dir.joinpath(*parts)
+
+
+def _extract_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, extract_dir: Path, on_bytes: Optional[BytesCallback] = None) -> int:
+	target = _safe_target(extract_dir, info.filename)
+	if info.is_dir():
+		target.mkdir(parents=True, exist_ok=True)
+		return 0
+	target.parent.mkdir(parents=True, exist_ok=True)
+	with zf.open(info) as src, open(target, "wb") as dst:
+		if on_bytes is None:
+			shutil.copyfileobj(src, dst, COPY_BUFFER)
+		else:
+			while True:
+				buf = src.read(COPY_BUFFER)
+				if not buf:
+					break
+				dst.write(buf)
+				on_bytes(len(buf))
+	# Keep the archive's timestamp (like unzip) so re-extracted files stay cache hits
+	try:
+		ts = time.mktime(info.date_time + (0, 0, -1))
+		os.utime(target, (ts, ts))
+	except (OverflowError, ValueError, OSError):
+		pass
+	return info.file_size
+
+
+def _index_entries(z: Path) -> List[IndexEntry]:
 	with zipfile.ZipFile(z, 'r') as zf:
-		for info in zf.infolist():
-			zf.extract(info, extract_dir)
+		return [_entry_from_info(i) for i in zf.infolist()]
+
+
+def _split_entries(entries: List[IndexEntry], parts: int) -> List[List[IndexEntry]]:
+	# Longest-processing-time first: biggest compressed entries go to the lightest bucket
+	buckets: List[List[IndexEntry]] = [[] for _ in range(max(1, parts))]
+	heap = [(0, i) for i in range(len(buckets))]
+	for e in sorted(entries, key=lambda e: e.compress_size, reverse=True):
+		load, idx = heapq.heappop(heap)
+		buckets[idx].append(e)
+		heapq.heappush(heap, (load + max(1, e.compress_size), idx))
+	return [b for b in buckets if b]
+
+
+def _already_extracted(info: zipfile.ZipInfo, extract_dir: Path, journal: ExtractJournal) -> bool:
+	target = _safe_target(extract_dir, info.filename)
+	if journal.is_done(info, target):
+		return True
+	# Not journaled: a file of the right size may still be a complete write from before the crash
+	try:
+		if target.stat().st_size != info.file_size:
+			return False
+		if _file_crc32(target) != info.CRC:
+			return False
+	except OSError:
+		return False
+	journal.mark_done(info)
+	return True
+
+
+def _extract_entries(
+	zf: zipfile.ZipFile,
+	infos: List[zipfile.ZipInfo],
+	extract_dir: Path,
+	on_bytes: Optional[BytesCallback] = None,
+	journal: Optional[ExtractJournal] = None,
+) -> int:
+	bytes_done = 0
+	for info in infos:
+		if journal and not info.is_dir() and _already_extracted(info, extract_dir, journal):
+			if on_bytes:
+				on_bytes(info.file_size)
 			bytes_done += info.file_size
+			continue
+		bytes_done += _extract_member(zf, info, extract_dir, on_bytes)
+		if journal and not info.is_dir():
+			journal.mark_done(info)
+	return bytes_done
+
+
+def _extract_chunk(
+	z: Path,
+	names: List[str],
+	extract_dir: Path,
+	on_bytes: Optional[BytesCallback] = None,
+	journal: Optional[ExtractJournal] = None,
+) -> int:
+	# Each worker gets its own ZipFile handle (own file position, own decompressor)
+	with zipfile.ZipFile(z, 'r') as zf:
+		return _extract_entries(zf, [zf.getinfo(n) for n in names], extract_dir, on_bytes, journal)
+
+
+def _extract_archive(
+	z: Path,
+	extract_dir: Path,
+	split_workers: int = 1,
+	on_bytes: Optional[BytesCallback] = None,
+	resume: bool = True,
+	index: Optional[ZipIndex] = None,
+	entries: Optional[List[IndexEntry]] = None,
+	selection: str = "",
+) -> Tuple[str, int]:
+	# entries: pre-filtered subset to extract (None = everything in the archive)
+	journal: Optional[ExtractJournal] = None
+	if resume:
+		journal = ExtractJournal.for_archive(z, extract_dir, selection)
+		journal.load()
+		if journal.complete and (entries is not None or index is not None):
+			# Nothing left to do; the size is known without opening the archive
+			bytes_done = sum(e.file_size for e in entries) if entries is not None else index.total_size(z)
+			if on_bytes:
+				on_bytes(bytes_done)
+			return (z.name, bytes_done)
+	bytes_done = 0
+	if journal:
+		journal.open()
+	try:
+		if entries is None and split_workers > 1:
+			# Plan from the central directory (indexed when available) and fan out
+			entries = index.entries(z) if index is not None else _index_entries(z)
+		if entries is not None and split_workers > 1 and len(entries) > 1:
+			# Create the directory tree up front so workers never race on mkdir
+			for parent in {_safe_target(extract_dir, e.name if e.is_dir else posixpath.dirname(e.name)) for e in entries}:
+				parent.mkdir(parents=True, exist_ok=True)
+			chunks = [[e.name for e in chunk] for chunk in _split_entries([e for e in entries if not e.is_dir], split_workers)]
+			with ThreadPoolExecutor(max_workers=split_workers) as pool:
+				for n in pool.map(lambda names: _extract_chunk(z, names, extract_dir, on_bytes, journal), chunks):
+					bytes_done += n
+		else:
+			with zipfile.ZipFile(z, 'r') as zf:
+				infos = zf.infolist() if entries is None else [zf.getinfo(e.name) for e in entries]
+				bytes_done = _extract_entries(zf, infos, extract_dir, on_bytes, journal)
+		if journal:
+			journal.mark_complete()
+	finally:
+		if journal:
+			journal.close()
 	return (z.name, bytes_done)
 
 
@@ -45,6 +352,11 @@ def extract_all(
 	extract_dir: Path,
 	progress_cb: Optional[ProgressCallback] = None,
 	max_workers: Optional[int] = None,
+	split_workers: Optional[int] = None,
+	progress_hz: float = 5.0,
+	resume: bool = True,
+	media_only: bool = False,
+	include: Optional[List[str]] = None,
 ) -> None:
 	download_dir = Path(download_dir)
 	extract_dir = Path(extract_dir)
@@ -66,35 +378,88 @@ def extract_all(
 		except Exception:
 			max_workers = 2
 
+	# Spread idle workers over the archives' entries when there are fewer archives than workers
+	if split_workers is None:
+		split_workers = max(1, max_workers // len(archives))
+
 	# Pre-calc sizes per archive and global totals
-	archive_sizes = _calc_archive_sizes(archives)
+	try:
+		index: Optional[ZipIndex] = ZipIndex.for_dir(download_dir)
+	except Exception:
+		index = None
+	filtering = media_only or bool(include)
+	plans: Dict[Path, Optional[List[IndexEntry]]] = {}
+	bytes_skipped = 0
+	entries_skipped = 0
+	if filtering:
+		# Decide from the central directory alone; skipped entries are never decompressed
+		exts = set(MEDIA_EXTS) if media_only else set()
+		exts.update(i for i in (include or []) if i.startswith("."))
+		globs = [i for i in (include or []) if not i.startswith(".")]
+		indexed: Dict[Path, List[IndexEntry]] = {}
+		for z in archives:
+			try:
+				indexed[z] = index.entries(z) if index is not None else _index_entries(z)
+			except Exception:
+				plans[z] = None
+		selected = select_entries(indexed, exts, globs)
+		archive_sizes = []
+		for z in archives:
+			if z not in indexed:
+				archive_sizes.append((z, 0))
+				continue
+			kept = selected[z]
+			kept_bytes = sum(e.file_size for e in kept)
+			files = [e for e in indexed[z] if not e.is_dir]
+			bytes_skipped += sum(e.file_size for e in files) - kept_bytes
+			entries_skipped += len(files) - len(kept)
+			archive_sizes.append((z, kept_bytes))
+			plans[z] = kept
+		selection = json.dumps({"exts": sorted(exts), "globs": globs})
+		console.print(f"Skipping {entries_skipped} non-media entries ({format_bytes(bytes_skipped)}).")
+	else:
+		archive_sizes = _calc_archive_sizes(archives, index)
+		selection = ""
 	global_total_bytes = sum(s for _, s in archive_sizes)
-	global_done_bytes = 0
-	lock = threading.Lock()
-
-	with ThreadPoolExecutor(max_workers=max_workers) as executor:
-		futures = {executor.submit(_extract_archive, z, extract_dir): (z, size) for z, size in archive_sizes}
-		with tqdm(total=len(futures), desc="Extracting archives", unit="archive") as pbar:
-			for fut in as_completed(futures):
-				z, size = futures[fut]
-				try:
-					name, bytes_done = fut.result()
-					with lock:
-						global_done_bytes += bytes_done
-					pbar.update(1)
-					if progress_cb:
-						progress_cb({
-							"phase": "extract",
-							"event": "file_progress",
-							"archive": name,
-							"bytes_done": global_done_bytes,
-							"bytes_total": global_total_bytes,
-						})
-					if progress_cb:
-						progress_cb({"phase": "extract", "event": "file_complete", "archive": name})
-				except Exception as e:
-					if progress_cb:
-						progress_cb({"phase": "extract", "event": "file_error", "archive": z.name, "error": str(e)})
+
+	def _emit_bytes(total: int) -> None:
+		if progress_cb:
+			progress_cb({"phase": "extract", "event": "bytes_progress", "bytes_done": total, "bytes_total": global_total_bytes})
+
+	# Workers report every decompressed chunk; the throttle merges them into a steady event rate
+	throttle = ProgressThrottle(_emit_bytes, rate_hz=progress_hz)
+	on_bytes = throttle.add if progress_cb else None
+
+	with tqdm(total=len(archive_sizes), desc="Extracting archives", unit="archive") as pbar:
+
+		def _on_done(z: Path, fut: Future) -> None:
+			try:
+				name, bytes_done = fut.result()
+				pbar.update(1)
+				if progress_cb:
+					throttle.flush()
+					progress_cb({
+						"phase": "extract",
+						"event": "file_progress",
+						"archive": name,
+						"bytes_done": throttle.total,
+						"bytes_total": global_total_bytes,
+					})
+				if progress_cb:
+					progress_cb({"phase": "extract", "event": "file_complete", "archive": name})
+			except Exception as e:
+				if progress_cb:
+					progress_cb({"phase": "extract", "event": "file_error", "archive": z.name, "error": str(e)})
+
+		with ThreadPoolExecutor(max_workers=max_workers) as executor:
+			# Archives are long tasks: one in flight per worker, the next is submitted (and its
+			# entry plan handed over) only when a worker frees up
+			submitter = BoundedSubmitter(executor, max_workers, _on_done, per_worker=1)
+			for z, _size in archive_sizes:
+				submitter.submit(z, _extract_archive, z, extract_dir, split_workers, on_bytes, resume, index, plans.pop(z, None), selection)
+			submitter.drain()
+	if index is not None:
+		index.close()
 	console.print("[green]Extraction complete.[/]")
 	if progress_cb:
-		progress_cb({"phase": "extract", "event": "end"})
+		progress_cb({"phase": "extract", "event": "end", "bytes_skipped": bytes_skipped, "entries_skipped": entries_skipped})
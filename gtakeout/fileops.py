@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import errno
+import filecmp
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, Union
+
+# Moving into the library: a rename when source and target share a filesystem, otherwise
+# a kernel-side copy (copy_file_range, then sendfile) in large chunks, a size check and
+# only then the unlink of the source.
+
+COPY_CHUNK = 64 * 1024 * 1024
+
+# How a file gets into the library. Every mode but "move" leaves the source tree as it is.
+MODE_MOVE = "move"
+MODE_REFLINK = "reflink"
+MODE_HARDLINK = "hardlink"
+MODE_SYMLINK = "symlink"
+OUTPUT_MODES = (MODE_MOVE, MODE_REFLINK, MODE_HARDLINK, MODE_SYMLINK)
+
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+PathLike = Union[str, Path]
+
+# Target directory -> st_dev; day folders never change device during a run
+_dir_devices: Dict[str, int] = {}
+
+
+def _dir_device(dir_path: str) -> int:
+	dev = _dir_devices.get(dir_path)
+	if dev is None:
+		dev = os.stat(dir_path).st_dev
+		_dir_devices[dir_path] = dev
+	return dev
+
+
+def same_device(src: PathLike, dst: PathLike) -> bool:
+	try:
+		return os.stat(src).st_dev == _dir_device(os.path.dirname(os.path.abspath(dst)))
+	except OSError:
+		return False
+
+
+def _copy_kernel(fsrc, fdst, size: int) -> bool:
+	# True when the kernel copied everything; False means "not supported here, use userspace"
+	# Elsewhere sendfile needs a socket as the output (macOS: ENOTSOCK) and
+	# copy_file_range does not exist
+	if not sys.platform.startswith("linux"):
+		return False
+	src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+	for name in ("copy_file_range", "sendfile"):
+		fn = getattr(os, name, None)
+		if fn is None:
+			continue
+		offset = 0
+		try:
+			while offset < size:
+				if name == "copy_file_range":
+					n = fn(src_fd, dst_fd, min(COPY_CHUNK, size - offset))
+				else:
+					n = fn(dst_fd, src_fd, offset, min(COPY_CHUNK, size - offset))
+				if n == 0:
+					break
+				offset += n
+		except OSError as e:
+			if offset == 0 and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF):
+				continue
+			raise
+		# Stopped short (e.g. 0 from a filesystem that cannot serve the range): the caller
+		# resets dst and copies in userspace
+		return offset == size
+	return False
+
+
+def copy_file(src: PathLike, dst: PathLike) -> int:
+	# Copies data and timestamps; dst must not exist yet. Returns the byte count.
+	size = os.stat(src).st_size
+	with open(src, "rb") as fsrc:
+		fdst = open(dst, "xb")
+		try:
+			with fdst:
+				if not _copy_kernel(fsrc, fdst, size):
+					fsrc.seek(0)
+					fdst.seek(0)
+					fdst.truncate()
+					shutil.copyfileobj(fsrc, fdst, COPY_CHUNK)
+			shutil.copystat(src, dst)
+			copied = os.stat(dst).st_size
+			if copied != size:
+				raise OSError(errno.EIO, f"Copy of {src} is {copied} bytes, expected {size}")
+		except BaseException:
+			# Only the file created here is removed, never one that was already there
+			try:
+				os.unlink(dst)
+			except OSError:
+				pass
+			raise
+	return size
+
+
+def move_file(src: PathLike, dst: PathLike) -> None:
+	if same_device(src, dst):
+		try:
+			os.rename(src, dst)
+			return
+		except OSError as e:
+			if e.errno != errno.EXDEV:
+				raise
+	copy_file(src, dst)
+	os.unlink(src)
+
+
+def reflink_file(src: PathLike, dst: PathLike) -> bool:
+	# Copy-on-write clone (btrfs, XFS, ...): instant and no extra space until either side
+	# changes. Falls back to a regular copy; returns whether the clone worked.
+	try:
+		import fcntl
+	except ImportError:
+		fcntl = None
+	if fcntl is not None:
+		with open(src, "rb") as fsrc:
+			fdst = open(dst, "xb")
+			try:
+				with fdst:
+					fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+				shutil.copystat(src, dst)
+				return True
+			except OSError:
+				os.unlink(dst)
+	copy_file(src, dst)
+	return False
+
+
+def already_placed(src: PathLike, dst: PathLike, mode: str) -> bool:
+	# Whether an earlier run already put src at dst (only the modes that keep the source)
+	try:
+		if mode == MODE_SYMLINK:
+			return os.path.islink(dst) and os.path.samefile(src, dst)
+		if mode == MODE_HARDLINK:
+			return os.path.samefile(src, dst)
+		if mode == MODE_REFLINK:
+			# A clone is a separate inode; only the bytes prove it is this file. Extracted
+			# photos share ZIP timestamps, so size + mtime would match distinct files.
+			return os.path.getsize(src) == os.path.getsize(dst) and filecmp.cmp(src, dst, shallow=False)
+	except OSError:
+		pass
+	return False
+
+
+def check_mode(mode: str, source_dir: PathLike, dest_dir: PathLike) -> None:
+	# Fail once, before any work, instead of with EXDEV on every file
+	if mode != MODE_HARDLINK:
+		return
+	try:
+		same = os.stat(source_dir).st_dev == os.stat(dest_dir).st_dev
+	except OSError:
+		return
+	if not same:
+		raise OSError(errno.EXDEV, f"Hardlink mode needs the library on the same drive as {source_dir}; use reflink, symlink or move instead")
+
+
+def place_file(src: PathLike, dst: PathLike, mode: str = MODE_MOVE) -> None:
+	if mode == MODE_MOVE:
+		move_file(src, dst)
+	elif mode == MODE_REFLINK:
+		reflink_file(src, dst)
+	elif mode == MODE_HARDLINK:
+		os.link(src, dst)
+	elif mode == MODE_SYMLINK:
+		os.symlink(os.path.abspath(src), dst)
+	else:
+		raise ValueError(f"Unknown output mode: {mode}")
@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from rich.console import Console
+
+from .downloadstate import CancelToken, DownloadProgress, DownloadState, archive_complete
+from .utils import BoundedSubmitter, format_bytes
+
+console = Console()
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+BytesCallback = Callable[[int], None]
+# (size or -1, bytes already on disk), called once the server has answered
+SizeCallback = Callable[[int, int], None]
+
+# The browser signs in; the archives themselves are fetched here with the browser's
+# cookies, streamed straight to disk in large chunks over a pooled connection.
+
+CHUNK_BYTES = 4 * 1024 * 1024
+TIMEOUT = (30, 120)  # connect, read (seconds)
+
+# Large parts are split into byte ranges fetched over several connections at once. The
+# connection count starts at 2 and grows while each new connection still gets roughly the
+# speed the others had (the link is not full yet), up to MAX_SEGMENTS.
+MAX_SEGMENTS = 8
+SEGMENT_MIN_BYTES = 32 * 1024 * 1024  # never split a range below this
+SEGMENT_CHUNK = 1024 * 1024
+ADAPT_SECONDS = 2.0
+RANGE_RETRIES = 3
+
+# An unfinished download is "<name>.part" plus "<name>.part.json": the server's validator
+# (ETag / Last-Modified and size) and the byte ranges still missing, rewritten every
+# CHECKPOINT_SECONDS and when a download stops. A rerun asks only for the missing ranges,
+# with If-Range, so a file that changed on the server starts over instead of being spliced.
+CHECKPOINT_SECONDS = 10.0
+
+_FILENAME_STAR = re.compile(r"filename\*\s*=\s*(?:UTF-8|utf-8)''([^;]+)")
+_FILENAME = re.compile(r'filename\s*=\s*"?([^";]+)"?')
+_ILLEGAL = str.maketrans({c: "_" for c in '\\/:<>|"?*'})
+
+
+class AuthRequired(Exception):
+	# The server answered with a web page instead of the archive (sign-in expired or
+	# Google wants the password again); the browser engine can still click through it
+	pass
+
+
+class DownloadCancelled(Exception):
+	pass
+
+
+def session_from_cookies(cookies: Iterable[Dict[str, Any]], user_agent: Optional[str] = None, pool_size: int = MAX_SEGMENTS) -> requests.Session:
+	# cookies: Playwright's BrowserContext.cookies() records
+	session = requests.Session()
+	for c in cookies:
+		session.cookies.set(
+			c["name"],
+			c["value"],
+			domain=c.get("domain", ""),
+			path=c.get("path", "/"),
+			secure=bool(c.get("secure")),
+		)
+	if user_agent:
+		session.headers["User-Agent"] = user_agent
+	adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+	session.mount("https://", adapter)
+	session.mount("http://", adapter)
+	return session
+
+
+def filename_from_response(resp: requests.Response, default: str = "download.zip") -> str:
+	cd = resp.headers.get("Content-Disposition", "")
+	m = _FILENAME_STAR.search(cd)
+	name = unquote(m.group(1).strip()) if m else None
+	if not name:
+		m = _FILENAME.search(cd)
+		name = m.group(1).strip() if m else None
+	if not name:
+		name = unquote(os.path.basename(urlparse(resp.url).path))
+	name = os.path.basename(name.replace("\\", "/")).translate(_ILLEGAL).strip(" .")
+	return name or default
+
+
+class _Segment:
+	# Byte range [pos, end] still to fetch; end moves down when the range is split.
+	# pos counts bytes handed to the writer, written the bytes already in the file.
+	def __init__(self, start: int, end: int) -> None:
+		self.pos = start
+		self.written = start
+		self.end = end
+
+	@property
+	def remaining(self) -> int:
+		return self.end + 1 - self.pos
+
+
+def _meta_path(part: Path) -> Path:
+	return part.with_name(part.name + ".json")
+
+
+def _validator(resp: requests.Response, size: int) -> Optional[Dict[str, Any]]:
+	# Only a strong ETag or a Last-Modified date can prove the bytes on disk are still valid
+	etag = resp.headers.get("ETag")
+	if etag and etag.startswith("W/"):
+		etag = None
+	last_modified = resp.headers.get("Last-Modified")
+	if size <= 0 or not (etag or last_modified):
+		return None
+	return {"url": resp.url, "etag": etag, "last_modified": last_modified, "size": size}
+
+
+def _save_meta(part: Path, validator: Dict[str, Any], ranges: List[Tuple[int, int]]) -> None:
+	# The data must be on disk before the offsets that vouch for it
+	with open(part, "r+b") as f:
+		os.fsync(f.fileno())
+	meta = _meta_path(part)
+	tmp = meta.with_name(meta.name + ".tmp")
+	tmp.write_text(json.dumps({**validator, "ranges": [list(r) for r in ranges]}), encoding="utf-8")
+	os.replace(tmp, meta)
+
+
+def _resume_ranges(part: Path, validator: Optional[Dict[str, Any]]) -> Optional[List[Tuple[int, int]]]:
+	# Missing byte ranges of a partial download of this exact file, or None to start over
+	if validator is None:
+		return None
+	try:
+		meta = json.loads(_meta_path(part).read_text(encoding="utf-8"))
+		# A streamed .part only grows as far as it got; a segmented one is preallocated
+		if os.path.getsize(part) > validator["size"] or meta.get("size") != validator["size"]:
+			return None
+		if validator["etag"] and meta.get("etag") != validator["etag"]:
+			return None
+		if not validator["etag"] and meta.get("last_modified") != validator["last_modified"]:
+			return None
+		return [(int(a), int(b)) for a, b in meta["ranges"] if int(b) >= int(a)]
+	except (OSError, ValueError, KeyError, TypeError):
+		return None
+
+
+def _preallocate(part: Path, size: int) -> None:
+	with open(part, "wb") as f:
+		if size and hasattr(os, "posix_fallocate"):
+			try:
+				os.posix_fallocate(f.fileno(), 0, size)
+				return
+			except OSError:
+				pass
+		f.truncate(size)
+
+
+def _split_largest(segments: List[_Segment], lock: threading.Lock) -> Optional[_Segment]:
+	with lock:
+		if not segments:
+			return None
+		seg = max(segments, key=lambda s: s.remaining)
+		if seg.remaining < 2 * SEGMENT_MIN_BYTES:
+			return None
+		mid = seg.pos + seg.remaining // 2
+		new = _Segment(mid, seg.end)
+		seg.end = mid - 1
+		segments.append(new)
+		return new
+
+
+def _fetch_range(
+	session: requests.Session,
+	url: str,
+	part: Path,
+	seg: _Segment,
+	lock: threading.Lock,
+	on_bytes: Optional[BytesCallback],
+	abort: threading.Event,
+	cancel: Optional[CancelToken],
+	if_range: Optional[str] = None,
+) -> None:
+	attempt = 0
+	while seg.remaining > 0:
+		try:
+			headers = {"Range": f"bytes={seg.pos}-{seg.end}"}
+			if if_range:
+				headers["If-Range"] = if_range
+			# Unbuffered: whatever write() returned for is in the file, which checkpoints rely on
+			with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as resp, open(part, "r+b", buffering=0) as f:
+				if resp.status_code != 206:
+					raise IOError(f"Server ignored the range request (HTTP {resp.status_code}); the file may have changed")
+				for chunk in resp.iter_content(SEGMENT_CHUNK):
+					if abort.is_set():
+						return
+					if cancel and cancel.is_cancelled:
+						raise DownloadCancelled()
+					# Reserve the bytes first so a concurrent split never hands them out twice
+					with lock:
+						offset = seg.pos
+						n = min(len(chunk), seg.remaining)
+						seg.pos += n
+					if n <= 0:
+						break
+					f.seek(offset)
+					f.write(chunk[:n] if n < len(chunk) else chunk)
+					seg.written = offset + n
+					if on_bytes:
+						on_bytes(n)
+					if seg.remaining <= 0:
+						break
+		except requests.RequestException:
+			# Connection dropped: carry on from the last byte written
+			attempt += 1
+			if attempt > RANGE_RETRIES:
+				raise
+
+
+def _fetch_segmented(
+	session: requests.Session,
+	url: str,
+	part: Path,
+	size: int,
+	on_bytes: Optional[BytesCallback] = None,
+	cancel: Optional[CancelToken] = None,
+	max_segments: int = MAX_SEGMENTS,
+	validator: Optional[Dict[str, Any]] = None,
+	ranges: Optional[List[Tuple[int, int]]] = None,
+) -> None:
+	# ranges: what a previous run left to fetch; None downloads the whole file
+	if ranges is None:
+		_preallocate(part, size)
+		ranges = [(0, size - 1)]
+	lock = threading.Lock()
+	abort = threading.Event()
+	segments = [_Segment(a, b) for a, b in ranges]
+	waiting = list(segments)
+	counted = 0
+	if_range = (validator.get("etag") or validator.get("last_modified")) if validator else None
+
+	def _count(n: int) -> None:
+		nonlocal counted
+		with lock:
+			counted += n
+		if on_bytes:
+			on_bytes(n)
+
+	def _checkpoint() -> None:
+		if validator is None:
+			return
+		with lock:
+			left = [(s.written, s.end) for s in segments if s.end >= s.written]
+		_save_meta(part, validator, left)
+
+	try:
+		with ThreadPoolExecutor(max_workers=max_segments) as pool:
+			def _start(seg: _Segment) -> Any:
+				return pool.submit(_fetch_range, session, url, part, seg, lock, _count, abort, cancel, if_range)
+
+			running: Set[Future] = set()
+			target = min(2, max_segments)
+			last_per_conn: Optional[float] = None
+			tick_bytes, tick_time = 0, time.monotonic()
+			saved_at = tick_time
+			try:
+				while True:
+					# Keep `target` connections busy: leftover ranges first, then by splitting
+					# the largest range left
+					while len(running) < target:
+						if waiting:
+							running.add(_start(waiting.pop(0)))
+							continue
+						new = _split_largest(segments, lock)
+						if new is None:
+							break
+						running.add(_start(new))
+					if not running:
+						break
+					done, running = wait(running, timeout=ADAPT_SECONDS, return_when=FIRST_COMPLETED)
+					for fut in done:
+						fut.result()
+					now = time.monotonic()
+					if now - tick_time >= ADAPT_SECONDS and running:
+						per_conn = (counted - tick_bytes) / (now - tick_time) / len(running)
+						if target < max_segments and (last_per_conn is None or per_conn >= 0.8 * last_per_conn):
+							target += 1
+						elif last_per_conn and per_conn < 0.5 * last_per_conn and target > 1:
+							target -= 1
+						last_per_conn = per_conn
+						tick_bytes, tick_time = counted, now
+					if now - saved_at >= CHECKPOINT_SECONDS:
+						_checkpoint()
+						saved_at = now
+			except BaseException:
+				abort.set()
+				raise
+	finally:
+		# Workers have stopped: record exactly what made it to disk
+		_checkpoint()
+	missing = sum(s.remaining for s in segments)
+	if missing:
+		raise IOError(f"{part.name}: {missing} bytes missing after segmented download")
+
+
+def _fetch_stream(
+	resp: requests.Response,
+	part: Path,
+	size: int,
+	on_bytes: Optional[BytesCallback] = None,
+	cancel: Optional[CancelToken] = None,
+	validator: Optional[Dict[str, Any]] = None,
+) -> None:
+	written = 0
+	saved_at = time.monotonic()
+	with open(part, "wb") as f:
+		def _checkpoint() -> None:
+			if validator is not None and written < size:
+				f.flush()
+				_save_meta(part, validator, [(written, size - 1)])
+
+		try:
+			for chunk in resp.iter_content(CHUNK_BYTES):
+				if cancel and cancel.is_cancelled:
+					raise DownloadCancelled()
+				f.write(chunk)
+				written += len(chunk)
+				if on_bytes:
+					on_bytes(len(chunk))
+				if time.monotonic() - saved_at >= CHECKPOINT_SECONDS:
+					_checkpoint()
+					saved_at = time.monotonic()
+		except BaseException:
+			_checkpoint()
+			raise
+	if size >= 0 and written != size:
+		raise IOError(f"{part.name}: got {written} bytes, expected {size}")
+
+
+def fetch(
+	session: requests.Session,
+	url: str,
+	download_dir: Path,
+	on_bytes: Optional[BytesCallback] = None,
+	cancel: Optional[CancelToken] = None,
+	resume: bool = True,
+	max_segments: int = MAX_SEGMENTS,
+	on_size: Optional[SizeCallback] = None,
+) -> Tuple[Path, bool]:
+	# Returns (file, skipped). The body goes to "<name>.part" and is renamed only once its
+	# size checks out. With resume, a complete file is skipped and a partial one continued.
+	with session.get(url, stream=True, timeout=TIMEOUT) as resp:
+		resp.raise_for_status()
+		if resp.headers.get("Content-Type", "").lower().startswith("text/html"):
+			raise AuthRequired(f"Got a web page instead of an archive from {resp.url}")
+		dest = Path(download_dir) / filename_from_response(resp)
+		expected = int(resp.headers.get("Content-Length") or -1)
+		if resume and archive_complete(dest, expected):
+			if on_size:
+				size = dest.stat().st_size
+				on_size(size, size)
+			return (dest, True)
+		part = dest.with_name(dest.name + ".part")
+		ranged = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+		validator = _validator(resp, expected) if ranged else None
+		ranges = _resume_ranges(part, validator) if resume else None
+		if ranges is None:
+			_meta_path(part).unlink(missing_ok=True)
+		if on_size:
+			on_size(expected, expected - sum(b + 1 - a for a, b in ranges) if ranges is not None else 0)
+		if ranges is not None or (max_segments > 1 and ranged and expected >= 2 * SEGMENT_MIN_BYTES):
+			if ranges is not None:
+				console.print(f"Resuming {dest.name}: {format_bytes(expected - sum(b + 1 - a for a, b in ranges))} already on disk")
+			resp.close()
+			_fetch_segmented(session, resp.url, part, expected, on_bytes, cancel, max(1, max_segments), validator, ranges)
+		else:
+			_fetch_stream(resp, part, expected, on_bytes, cancel, validator)
+	if expected >= 0 and os.path.getsize(part) != expected:
+		raise IOError(f"{dest.name}: size {os.path.getsize(part)}, expected {expected}")
+	os.replace(part, dest)
+	_meta_path(part).unlink(missing_ok=True)
+	return (dest, False)
+
+
+def download_targets(
+	targets: List[Tuple[str, str]],
+	download_dir: Path,
+	session: requests.Session,
+	state: DownloadState,
+	progress_cb: Optional[ProgressCallback] = None,
+	cancel: Optional[CancelToken] = None,
+	resume: bool = True,
+	max_segments: int = MAX_SEGMENTS,
+	parallel: int = 1,
+	progress_hz: float = 5.0,
+) -> None:
+	# targets: (state key, absolute URL). Emits the same events as the browser engine.
+	# Up to `parallel` parts are in flight; a new one starts as soon as one finishes.
+	download_dir = Path(download_dir)
+	total_files = len(targets)
+	completed_count = 0
+	stopped = False
+	todo = sum(1 for key, _ in targets if not (resume and key in state.completed_keys))
+	meter = DownloadProgress(progress_cb, todo, rate_hz=progress_hz) if progress_cb else None
+
+	def _one(key: str, url: str) -> Path:
+		state.mark_started(key)
+
+		def _on_bytes(n: int) -> None:
+			state.add_bytes(key, n)
+			if meter:
+				meter.add(n)
+
+		on_size = (lambda size, on_disk: meter.part_size(key, size, on_disk)) if meter else None
+		dest, _skipped = fetch(session, url, download_dir, on_bytes=_on_bytes, cancel=cancel, resume=resume, max_segments=max_segments, on_size=on_size)
+		return dest
+
+	def _on_done(tag: Tuple[str, str], fut: Future) -> None:
+		nonlocal completed_count, stopped
+		key, url = tag
+		try:
+			dest = fut.result()
+			state.mark_completed(key, dest.name)
+			completed_count += 1
+			if meter:
+				meter.flush()
+			if progress_cb:
+				progress_cb({"phase": "download", "event": "file_complete", "filename": dest.name, "completed_files": completed_count, "total_files": total_files, "bytes_completed": state.completed_bytes(download_dir)})
+		except DownloadCancelled:
+			state.mark_failed(key, "cancelled")
+			stopped = True
+		except Exception as e:
+			state.mark_failed(key, str(e))
+			console.print(f"[red]Failed to download {url}: {e}[/]")
+			if progress_cb:
+				progress_cb({"phase": "download", "event": "file_error", "key": key, "error": str(e)})
+
+	parallel = max(1, parallel)
+	with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="download") as executor:
+		submitter = BoundedSubmitter(executor, parallel, _on_done, per_worker=1)
+		for key, url in targets:
+			if stopped or (cancel and cancel.is_cancelled):
+				stopped = True
+				break
+			if resume and key in state.completed_keys:
+				completed_count += 1
+				if progress_cb:
+					progress_cb({"phase": "download", "event": "file_skipped", "key": key, "completed_files": completed_count, "total_files": total_files})
+				continue
+			submitter.submit((key, url), _one, key, url)
+		submitter.drain()
+	if stopped:
+		console.print("[yellow]Download paused/cancelled by user.[/]")
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import io
+import struct
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+# Header-only date readers. Each one reads a few small pieces of the file and walks
+# the container structure directly instead of decoding the image.
+
+HEADER_BYTES = 64 * 1024
+MAX_SCAN_BYTES = 1024 * 1024  # give up on JPEGs whose Exif is not within the first MB
+
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+
+_TYPE_ASCII = 2
+
+
+def _parse_exif_datetime(raw: bytes) -> Optional[datetime]:
+	# EXIF format: "YYYY:MM:DD HH:MM:SS"
+	try:
+		return datetime.strptime(raw.split(b"\0", 1)[0].decode("ascii").strip(), "%Y:%m:%d %H:%M:%S")
+	except Exception:
+		return None
+
+
+def _read_ifd(tiff: bytes, offset: int, bo: str) -> dict:
+	# tag -> raw bytes for ASCII values, or int for LONG/SHORT pointers
+	out: dict = {}
+	if offset <= 0 or offset + 2 > len(tiff):
+		return out
+	(count,) = struct.unpack_from(bo + "H", tiff, offset)
+	pos = offset + 2
+	for _ in range(count):
+		if pos + 12 > len(tiff):
+			break
+		tag, typ, n, value = struct.unpack_from(bo + "HHII", tiff, pos)
+		pos += 12
+		if tag in (TAG_DATETIME, TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED) and typ == _TYPE_ASCII:
+			if n <= 4:
+				out[tag] = tiff[pos - 4:pos - 4 + n]
+			elif value + n <= len(tiff):
+				out[tag] = tiff[value:value + n]
+		elif tag == TAG_EXIF_IFD:
+			out[tag] = value
+	return out
+
+
+def parse_tiff_dates(tiff: bytes) -> Optional[datetime]:
+	# tiff: an Exif payload starting at the TIFF header ("II*\0" or "MM\0*")
+	if len(tiff) < 8:
+		return None
+	if tiff[:2] == b"II":
+		bo = "<"
+	elif tiff[:2] == b"MM":
+		bo = ">"
+	else:
+		return None
+	magic, ifd0 = struct.unpack_from(bo + "HI", tiff, 2)
+	if magic != 42:
+		return None
+	tags = _read_ifd(tiff, ifd0, bo)
+	exif_ifd = tags.get(TAG_EXIF_IFD)
+	if isinstance(exif_ifd, int):
+		tags.update(_read_ifd(tiff, exif_ifd, bo))
+	for tag in (TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED, TAG_DATETIME):
+		raw = tags.get(tag)
+		if isinstance(raw, bytes):
+			dt = _parse_exif_datetime(raw)
+			if dt:
+				return dt
+	return None
+
+
+def _jpeg_exif_payload(fp: BinaryIO, data: bytes) -> Optional[bytes]:
+	pos = 2
+	while True:
+		if pos + 4 > len(data):
+			if len(data) >= MAX_SCAN_BYTES:
+				return None
+			more = fp.read(HEADER_BYTES)
+			if not more:
+				return None
+			data += more
+			continue
+		if data[pos] != 0xFF:
+			return None
+		marker = data[pos + 1]
+		if marker == 0xFF:  # fill byte
+			pos += 1
+			continue
+		if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # standalone markers
+			pos += 2
+			continue
+		if marker in (0xDA, 0xD9):  # image data starts: no Exif before it
+			return None
+		(length,) = struct.unpack_from(">H", data, pos + 2)
+		end = pos + 2 + length
+		if marker == 0xE1:
+			if end > len(data):
+				data += fp.read(end - len(data))
+			seg = data[pos + 4:end]
+			if seg[:6] == b"Exif\0\0":
+				return seg[6:]
+		pos = end
+
+
+def scan_exif_date(fp: BinaryIO) -> Tuple[bool, Optional[datetime]]:
+	# Returns (understood, date). understood=False means the format is not one we walk
+	# here and the caller should use a full decoder instead.
+	head = fp.read(HEADER_BYTES)
+	if head[:2] == b"\xff\xd8":
+		payload = _jpeg_exif_payload(fp, head)
+		return (True, parse_tiff_dates(payload) if payload else None)
+	if head[:4] in (b"II*\0", b"MM\0*"):
+		# TIFF: IFD offsets are absolute, so the header read may not cover them
+		dt = parse_tiff_dates(head + fp.read(MAX_SCAN_BYTES - len(head)))
+		return (dt is not None, dt)
+	if head[4:8] == b"ftyp":
+		# HEIC / HEIF / AVIF
+		fp.seek(0)
+		dt = scan_heif_date(fp)
+		return (dt is not None, dt)
+	return (False, None)
+
+
+def read_exif_date(photo: Union[Path, BinaryIO]) -> Tuple[bool, Optional[datetime]]:
+	if isinstance(photo, (str, Path)):
+		with open(photo, "rb") as fp:
+			return scan_exif_date(fp)
+	return scan_exif_date(photo)
+
+
+# ISO base media (MP4/MOV, HEIF/AVIF) files are a tree of sized boxes.
+
+
+def _iter_boxes(fp: BinaryIO, start: int, end: Optional[int]) -> Iterator[Tuple[bytes, int, int]]:
+	# Yields (type, payload_start, box_end) for the boxes between start and end
+	pos = start
+	while end is None or pos + 8 <= end:
+		fp.seek(pos)
+		header = fp.read(8)
+		if len(header) < 8:
+			return
+		size, box_type = struct.unpack(">I4s", header)
+		payload = pos + 8
+		if size == 1:
+			ext = fp.read(8)
+			if len(ext) < 8:
+				return
+			(size,) = struct.unpack(">Q", ext)
+			payload += 8
+		elif size == 0:
+			# Box runs to the end of its parent (or the file)
+			if end is None:
+				fp.seek(0, 2)
+				size = fp.tell() - pos
+			else:
+				size = end - pos
+		if size < payload - pos:
+			return
+		yield (box_type, payload, pos + size)
+		pos += size
+
+
+def _find_box(fp: BinaryIO, start: int, end: Optional[int], box_type: bytes) -> Optional[Tuple[int, int]]:
+	for t, payload, box_end in _iter_boxes(fp, start, end):
+		if t == box_type:
+			return (payload, box_end)
+	return None
+
+
+# HEIF / AVIF: same box structure. The Exif block is an item of the top-level meta box:
+# iinf names the item (type "Exif"), iloc says where its bytes live (file offset or idat).
+
+_MAX_META_BYTES = 4 * 1024 * 1024
+
+
+def _full_box(data: bytes, pos: int) -> Tuple[int, int]:
+	# (version, offset after version/flags)
+	return (data[pos], pos + 4)
+
+
+def _uint(data: bytes, pos: int, size: int) -> int:
+	return int.from_bytes(data[pos:pos + size], "big") if size else 0
+
+
+def _heif_exif_item(meta: bytes) -> Optional[int]:
+	buf = io.BytesIO(meta)
+	iinf = _find_box(buf, 0, len(meta), b"iinf")
+	if not iinf:
+		return None
+	version, pos = _full_box(meta, iinf[0])
+	pos += 2 if version == 0 else 4
+	for t, payload, _end in _iter_boxes(buf, pos, iinf[1]):
+		if t != b"infe":
+			continue
+		version, p = _full_box(meta, payload)
+		if version < 2:
+			continue
+		id_size = 2 if version == 2 else 4
+		item_id = _uint(meta, p, id_size)
+		if meta[p + id_size + 2:p + id_size + 6] == b"Exif":
+			return item_id
+	return None
+
+
+def _heif_item_extents(meta: bytes, item_id: int) -> Optional[Tuple[int, List[Tuple[int, int]]]]:
+	# (construction method, [(offset, length)]) of one item
+	iloc = _find_box(io.BytesIO(meta), 0, len(meta), b"iloc")
+	if not iloc:
+		return None
+	version, pos = _full_box(meta, iloc[0])
+	offset_size, length_size = meta[pos] >> 4, meta[pos] & 0x0F
+	base_offset_size, index_size = meta[pos + 1] >> 4, meta[pos + 1] & 0x0F
+	pos += 2
+	id_size = 2 if version < 2 else 4
+	count = _uint(meta, pos, id_size)
+	pos += id_size
+	for _ in range(count):
+		this_id = _uint(meta, pos, id_size)
+		pos += id_size
+		method = 0
+		if version in (1, 2):
+			method = _uint(meta, pos, 2) & 0x0F
+			pos += 2
+		pos += 2  # data_reference_index
+		base = _uint(meta, pos, base_offset_size)
+		pos += base_offset_size
+		extent_count = _uint(meta, pos, 2)
+		pos += 2
+		extents: List[Tuple[int, int]] = []
+		for _ in range(extent_count):
+			if version in (1, 2):
+				pos += index_size
+			off = _uint(meta, pos, offset_size)
+			pos += offset_size
+			length = _uint(meta, pos, length_size)
+			pos += length_size
+			extents.append((base + off, length))
+		if this_id == item_id:
+			return (method, extents)
+		if pos > len(meta):
+			break
+	return None
+
+
+def scan_heif_date(fp: BinaryIO) -> Optional[datetime]:
+	meta_box = _find_box(fp, 0, None, b"meta")
+	if not meta_box or meta_box[1] - meta_box[0] > _MAX_META_BYTES:
+		return None
+	fp.seek(meta_box[0])
+	# meta is a full box: its children start after version/flags
+	meta = fp.read(meta_box[1] - meta_box[0])[4:]
+	item_id = _heif_exif_item(meta)
+	if item_id is None:
+		return None
+	located = _heif_item_extents(meta, item_id)
+	if not located:
+		return None
+	method, extents = located
+	if method == 1:
+		idat = _find_box(io.BytesIO(meta), 0, len(meta), b"idat")
+		if not idat:
+			return None
+		data = b"".join(meta[idat[0] + off:idat[0] + off + length] for off, length in extents)
+	elif method == 0:
+		parts = []
+		for off, length in extents:
+			fp.seek(off)
+			parts.append(fp.read(min(length, MAX_SCAN_BYTES)))
+		data = b"".join(parts)
+	else:
+		return None
+	# Item payload: 4-byte offset to the TIFF header, sometimes followed by "Exif\0\0"
+	if len(data) < 4:
+		return None
+	(skip,) = struct.unpack_from(">I", data, 0)
+	tiff = data[4 + skip:]
+	if tiff[:6] == b"Exif\0\0":
+		tiff = tiff[6:]
+	return parse_tiff_dates(tiff)
+
+
+# QuickTime / MP4 (ISO base media): creation time lives in moov/mvhd, or per track in
+# moov/trak/tkhd, as seconds since 1904-01-01 UTC. Only box headers are read; mdat is
+# skipped with a seek however large it is.
+
+_MAC_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+_MIN_PLAUSIBLE = datetime(1971, 1, 1, tzinfo=timezone.utc)  # 0 / unset fields land in 1904
+
+
+def _mac_time(fp: BinaryIO, payload: int) -> Optional[datetime]:
+	# mvhd / tkhd: version(1) flags(3) creation_time(4 or 8) ...
+	fp.seek(payload)
+	head = fp.read(12)
+	if len(head) < 8:
+		return None
+	if head[0] == 1:
+		if len(head) < 12:
+			return None
+		(secs,) = struct.unpack_from(">Q", head, 4)
+	else:
+		(secs,) = struct.unpack_from(">I", head, 4)
+	try:
+		dt = _MAC_EPOCH + timedelta(seconds=secs)
+	except OverflowError:
+		return None
+	return dt if dt >= _MIN_PLAUSIBLE else None
+
+
+def scan_video_date(fp: BinaryIO) -> Optional[datetime]:
+	moov = _find_box(fp, 0, None, b"moov")
+	if not moov:
+		return None
+	mvhd = _find_box(fp, moov[0], moov[1], b"mvhd")
+	if mvhd:
+		dt = _mac_time(fp, mvhd[0])
+		if dt:
+			return dt
+	for t, payload, box_end in _iter_boxes(fp, moov[0], moov[1]):
+		if t != b"trak":
+			continue
+		tkhd = _find_box(fp, payload, box_end, b"tkhd")
+		if tkhd:
+			dt = _mac_time(fp, tkhd[0])
+			if dt:
+				return dt
+	return None
+
+
+def read_video_date(video: Union[Path, BinaryIO]) -> Optional[datetime]:
+	# Aware datetime (UTC) or None
+	try:
+		if isinstance(video, (str, Path)):
+			with open(video, "rb") as fp:
+				return scan_video_date(fp)
+		return scan_video_date(video)
+	except (OSError, struct.error, ValueError):
+		return None
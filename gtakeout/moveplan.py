@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from rich.console import Console
+
+from .datecache import DATECACHE_FILENAME, DateCache
+from .dedup import is_year_folder
+from .fileops import MODE_MOVE, check_mode, place_file
+from .organizer import ALBUMS_DIRNAME, DateResolver, _date_subdir, _scan_sources
+from .uniquenames import NameRegistry
+from .utils import BoundedSubmitter, format_bytes
+
+console = Console()
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# A move plan is a TSV file, one row per file operation:
+#   source  target  reason  size
+# reason is where the date came from (exif, container, sidecar, mtime) for moves,
+# "album-link" for a hardlink of an organized file (source is its library path) and
+# "duplicate" for a copy that is deleted (no target).
+PLAN_COLUMNS = ("source", "target", "reason", "size")
+REASON_ALBUM_LINK = "album-link"
+REASON_DUPLICATE = "duplicate"
+
+
+class PlanRow(NamedTuple):
+	source: str
+	target: str
+	reason: str
+	size: int
+
+
+class PlanProgress:
+	# Append-only list of finished plan rows, "<plan>.progress" next to the plan.
+	# The header pins the plan's size and mtime, so an edited plan starts over.
+	def __init__(self, plan_path: Path) -> None:
+		self.plan_path = plan_path
+		self.progress_path = plan_path.with_name(plan_path.name + ".progress")
+		self.done: Set[int] = set()
+		self._fh = None
+		self._lock = threading.Lock()
+
+	def _signature(self) -> Dict[str, Any]:
+		st = self.plan_path.stat()
+		return {"plan_size": st.st_size, "plan_mtime": int(st.st_mtime)}
+
+	def load(self) -> None:
+		if not self.progress_path.exists():
+			return
+		try:
+			with self.progress_path.open("r", encoding="utf-8") as f:
+				if json.loads(f.readline() or "{}") != self._signature():
+					return
+				for line in f:
+					line = line.strip()
+					if not line.isdigit():
+						break  # torn last line after a crash
+					self.done.add(int(line))
+		except Exception:
+			self.done = set()
+
+	def open(self) -> None:
+		fresh = not self.done
+		self._fh = self.progress_path.open("w" if fresh else "a", encoding="utf-8")
+		if fresh:
+			self._fh.write(json.dumps(self._signature()) + "\n")
+			self._fh.flush()
+
+	def close(self) -> None:
+		if self._fh:
+			self._fh.close()
+			self._fh = None
+
+	def mark_done(self, n: int) -> None:
+		with self._lock:
+			self.done.add(n)
+			if self._fh:
+				self._fh.write(f"{n}\n")
+				self._fh.flush()
+
+
+def build_plan(
+	source_dir: Path,
+	dest_dir: Path,
+	progress_cb: Optional[ProgressCallback] = None,
+	max_workers: Optional[int] = None,
+	dedupe: bool = False,
+	album_links: bool = False,
+	use_cache: bool = True,
+) -> List[PlanRow]:
+	# Absolute paths so the plan can be applied from any working directory
+	source_dir = Path(os.path.abspath(source_dir))
+	dest_dir = Path(os.path.abspath(dest_dir))
+	all_files, sidecars, duplicates = _scan_sources(source_dir, progress_cb, max_workers, dedupe, exclude=[dest_dir])
+	if progress_cb:
+		progress_cb({"phase": "organize", "event": "start", "total_files": len(all_files)})
+	if max_workers is None:
+		max_workers = max(2, min(8, os.cpu_count() or 2))
+
+	# Planning changes nothing on disk: an existing date cache is only read
+	cache: Optional[DateCache] = None
+	if use_cache and (dest_dir / DATECACHE_FILENAME).is_file():
+		try:
+			cache = DateCache.for_dir(dest_dir, read_only=True)
+		except sqlite3.Error:
+			cache = None
+	resolver = DateResolver(sidecars, cache)
+
+	def _resolve(p: Path) -> Tuple[Path, str, int, Path]:
+		dt, source = resolver.resolve(p)
+		return (p, source, p.stat().st_size, _date_subdir(dest_dir, dt))
+
+	resolved: List[Tuple[Path, str, int, Path]] = []
+
+	def _on_done(_tag: Any, fut: Future) -> None:
+		try:
+			resolved.append(fut.result())
+			if progress_cb:
+				progress_cb({"phase": "organize", "event": "file_complete", "filename": resolved[-1][0].name, "file_bytes": resolved[-1][2], "completed_files": len(resolved), "total_files": len(all_files)})
+		except Exception as e:
+			if progress_cb:
+				progress_cb({"phase": "organize", "event": "file_error", "error": str(e)})
+
+	with ThreadPoolExecutor(max_workers=max_workers) as executor:
+		submitter = BoundedSubmitter(executor, max_workers, _on_done)
+		for p in all_files:
+			submitter.submit(p, _resolve, p)
+		submitter.drain()
+	if cache is not None:
+		cache.close()
+
+	# Names are handed out in source order so the same tree always yields the same plan
+	resolved.sort(key=lambda r: str(r[0]))
+	names = NameRegistry()
+	moves: List[PlanRow] = []
+	links: List[PlanRow] = []
+	drops: List[PlanRow] = []
+	for path, source, size, subdir in resolved:
+		target = names.reserve(subdir, path.name)
+		moves.append(PlanRow(str(path), str(target), source, size))
+		for dup in duplicates.get(path, []):
+			if album_links and not is_year_folder(dup.parent.name):
+				link = names.reserve(dest_dir / ALBUMS_DIRNAME / dup.parent.name, dup.name)
+				links.append(PlanRow(str(target), str(link), REASON_ALBUM_LINK, size))
+			drops.append(PlanRow(str(dup), "", REASON_DUPLICATE, size))
+	moves.sort(key=lambda r: r.target)
+	links.sort(key=lambda r: r.target)
+	if progress_cb:
+		progress_cb({"phase": "organize", "event": "end"})
+	return moves + links + drops
+
+
+def write_plan(rows: List[PlanRow], plan_path: Path) -> None:
+	plan_path = Path(plan_path)
+	tmp = plan_path.with_name(plan_path.name + ".tmp")
+	with tmp.open("w", encoding="utf-8", newline="") as f:
+		writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+		writer.writerow(PLAN_COLUMNS)
+		writer.writerows(rows)
+	os.replace(tmp, plan_path)
+	# Progress recorded against an older plan at this path no longer applies
+	PlanProgress(plan_path).progress_path.unlink(missing_ok=True)
+
+
+def read_plan(plan_path: Path) -> List[PlanRow]:
+	with Path(plan_path).open("r", encoding="utf-8", newline="") as f:
+		reader = csv.reader(f, delimiter="\t")
+		header = next(reader, None)
+		if tuple(header or ()) != PLAN_COLUMNS:
+			raise ValueError(f"Not a move plan: {plan_path}")
+		return [PlanRow(r[0], r[1], r[2], int(r[3])) for r in reader if r]
+
+
+def _already_applied(row: PlanRow, mode: str) -> bool:
+	# Covers a crash between doing a row and recording it
+	if row.reason == REASON_DUPLICATE:
+		return mode != MODE_MOVE or not os.path.exists(row.source)
+	if row.reason == REASON_ALBUM_LINK:
+		return os.path.lexists(row.target)
+	if mode != MODE_MOVE:
+		return os.path.lexists(row.target)
+	try:
+		return not os.path.exists(row.source) and os.stat(row.target).st_size == row.size
+	except OSError:
+		return False
+
+
+def _apply_row(row: PlanRow, mode: str) -> None:
+	if row.reason == REASON_DUPLICATE:
+		# Duplicates only leave the source tree when files are being moved out of it
+		if mode == MODE_MOVE:
+			os.unlink(row.source)
+		return
+	if os.path.lexists(row.target):
+		raise FileExistsError(f"Target already exists: {row.target}")
+	if row.reason == REASON_ALBUM_LINK:
+		os.link(row.source, row.target)
+	else:
+		place_file(row.source, row.target, mode)
+
+
+def apply_plan(
+	plan_path: Path,
+	progress_cb: Optional[ProgressCallback] = None,
+	max_workers: Optional[int] = None,
+	mode: str = MODE_MOVE,
+) -> None:
+	plan_path = Path(plan_path)
+	rows = read_plan(plan_path)
+	progress = PlanProgress(plan_path)
+	progress.load()
+	pending = [(i, r) for i, r in enumerate(rows) if i not in progress.done]
+	if progress_cb:
+		progress_cb({"phase": "organize", "event": "start", "total_files": len(rows), "completed_files": len(rows) - len(pending)})
+	if not pending:
+		console.print("[green]Plan already applied.[/]")
+		if progress_cb:
+			progress_cb({"phase": "organize", "event": "end"})
+		return
+
+	# Every target directory is created once, up front
+	for d in sorted({os.path.dirname(r.target) for _, r in pending if r.target}):
+		os.makedirs(d, exist_ok=True)
+	first = next((r for _, r in pending if r.reason not in (REASON_ALBUM_LINK, REASON_DUPLICATE)), None)
+	if first is not None:
+		check_mode(mode, os.path.dirname(first.source), os.path.dirname(first.target))
+	if max_workers is None:
+		max_workers = max(2, min(8, os.cpu_count() or 2))
+
+	done = len(rows) - len(pending)
+	errors = 0
+	lock = threading.Lock()
+
+	def _run(batch: List[Tuple[int, PlanRow]]) -> None:
+		nonlocal done, errors
+		for i, row in batch:
+			try:
+				if not _already_applied(row, mode):
+					_apply_row(row, mode)
+				progress.mark_done(i)
+				with lock:
+					done += 1
+					if progress_cb:
+						progress_cb({"phase": "organize", "event": "file_complete", "filename": os.path.basename(row.source), "file_bytes": row.size, "completed_files": done, "total_files": len(rows)})
+			except Exception as e:
+				with lock:
+					errors += 1
+					if progress_cb:
+						progress_cb({"phase": "organize", "event": "file_error", "error": f"{row.source}: {e}"})
+
+	progress.open()
+	try:
+		# Moves first, one task per target directory (rows are already sorted by target);
+		# album links need the moved files and duplicates go last
+		moves = [(i, r) for i, r in pending if r.reason not in (REASON_ALBUM_LINK, REASON_DUPLICATE)]
+		with ThreadPoolExecutor(max_workers=max_workers) as executor:
+			futures = [executor.submit(_run, list(batch)) for _, batch in groupby(moves, key=lambda ir: os.path.dirname(ir[1].target))]
+			for fut in as_completed(futures):
+				fut.result()
+		_run([(i, r) for i, r in pending if r.reason == REASON_ALBUM_LINK])
+		_run([(i, r) for i, r in pending if r.reason == REASON_DUPLICATE])
+	finally:
+		progress.close()
+
+	if not errors:
+		progress.progress_path.unlink(missing_ok=True)
+	moved = sum(r.size for _, r in pending if r.reason not in (REASON_ALBUM_LINK, REASON_DUPLICATE))
+	console.print(f"[green]Applied {done} of {len(rows)} plan rows ({format_bytes(moved)}, {mode})[/]" + (f", [red]{errors} errors[/]" if errors else ""))
+	if progress_cb:
+		progress_cb({"phase": "organize", "event": "end"})
@@ -1,26 +1,75 @@
 from __future__ import annotations
 
 import json
-import shutil
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Callable, Dict, Any, List, Tuple
+from typing import Optional, Callable, Dict, Any, Iterable, Iterator, List, Tuple, Union, BinaryIO
 from PIL import Image, ExifTags
 from dateutil import tz
 from rich.console import Console
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
 import os
 import threading
 
+from .dedup import find_duplicates, is_year_folder, pick_keeper
+from .metadata import read_exif_date, read_video_date
+from .sidecars import SidecarIndex
+from .datecache import DateCache
+from .fileops import MODE_MOVE, already_placed, check_mode, place_file
+from .uniquenames import NameRegistry
+from .walker import walk_batches
+from .utils import BoundedSubmitter, format_bytes
+
 console = Console()
 
 ProgressCallback = Callable[[Dict[str, Any]], None]
 
 
-IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".heic", ".webp", ".tif", ".tiff", ".gif"}
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".heic", ".heif", ".avif", ".webp", ".tif", ".tiff", ".gif"}
+VIDEO_EXTS = {".mp4", ".mov", ".m4v", ".3gp", ".3g2", ".avi", ".mkv", ".mts", ".m2ts", ".wmv", ".mpg"}
+MEDIA_EXTS = IMAGE_EXTS | VIDEO_EXTS
+# QuickTime/MP4 family: creation time readable from the moov header
+_ISOBMFF_VIDEO_EXTS = {".mp4", ".mov", ".m4v", ".3gp", ".3g2"}
+ALBUMS_DIRNAME = "Albums"
+
+# Where EXIF/container parsing runs: worker threads of this process, or worker processes
+# (pure-Python parsing holds the GIL, so threads stop scaling after a couple of cores)
+ENGINE_THREAD = "thread"
+ENGINE_PROCESS = "process"
+ENGINES = (ENGINE_THREAD, ENGINE_PROCESS)
+DATE_BATCH = 64  # paths per process-pool task
+
+
+def _parse_sidecar_date(data: Any) -> Optional[datetime]:
+	ts = None
+	if isinstance(data, dict):
+		if "photoTakenTime" in data and isinstance(data["photoTakenTime"], dict):
+			val = data["photoTakenTime"].get("timestamp") or data["photoTakenTime"].get("seconds")
+			ts = int(val) if val is not None else None
+		elif "creationTime" in data and isinstance(data["creationTime"], dict):
+			val = data["creationTime"].get("timestamp") or data["creationTime"].get("seconds")
+			ts = int(val) if val is not None else None
+	elif isinstance(data, list) and data and isinstance(data[0], dict):
+		val = data[0].get("photoTakenTime", {}).get("timestamp")
+		ts = int(val) if val is not None else None
+	if ts:
+		return datetime.fromtimestamp(ts, tz=tz.tzlocal())
+	return None
+
+
+def _read_sidecar_date(json_path: Path) -> Optional[datetime]:
+	try:
+		return _parse_sidecar_date(json.loads(json_path.read_text(encoding="utf-8")))
+	except Exception:
+		return None
 
 
-def _find_sidecar_date(photo_path: Path) -> Optional[datetime]:
+def _find_sidecar_date(photo_path: Path, sidecars: Optional[SidecarIndex] = None) -> Optional[datetime]:
+	if sidecars is not None:
+		# Prebuilt index: no filesystem probing, and Takeout's mangled names resolve
+		found = sidecars.lookup_path(photo_path)
+		return _read_sidecar_date(found) if found else None
 	# Look for JSON sidecar: same stem + .json, or Google Takeout pattern
 	candidates = [
 		photo_path.with_suffix(photo_path.suffix + ".json"),  # e.g., IMG_1234.jpg.json
@@ -29,34 +78,35 @@ def _find_sidecar_date(photo_path: Path) -> Optional[datetime]:
 	for c in candidates:
 		if not c.exists():
 			continue
-		try:
-			data = json.loads(c.read_text(encoding="utf-8"))
-			ts = None
-			if isinstance(data, dict):
-				if "photoTakenTime" in data and isinstance(data["photoTakenTime"], dict):
-					val = data["photoTakenTime"].get("timestamp") or data["photoTakenTime"].get("seconds")
-					ts = int(val) if val is not None else None
-				elif "creationTime" in data and isinstance(data["creationTime"], dict):
-					val = data["creationTime"].get("timestamp") or data["creationTime"].get("seconds")
-					ts = int(val) if val is not None else None
-			elif isinstance(data, list) and data and isinstance(data[0], dict):
-				val = data[0].get("photoTakenTime", {}).get("timestamp")
-				ts = int(val) if val is not None else None
-			if ts:
-				return datetime.fromtimestamp(ts, tz=tz.tzlocal())
-		except Exception:
-			continue
+		dt = _read_sidecar_date(c)
+		if dt:
+			return dt
 	return None
 
 
-def _get_exif_date(photo_path: Path) -> Optional[datetime]:
+def _get_exif_date(photo: Union[Path, BinaryIO]) -> Optional[datetime]:
+	# Accepts a path or a seekable binary stream (e.g. a zip entry)
 	try:
-		with Image.open(photo_path) as img:
+		understood, dt = read_exif_date(photo)
+		if understood:
+			return dt
+	except Exception:
+		pass
+	return _get_exif_date_pillow(photo)
+
+
+def _get_exif_date_pillow(photo: Union[Path, BinaryIO]) -> Optional[datetime]:
+	# Slow path for formats the header reader does not walk
+	try:
+		if not isinstance(photo, (str, Path)):
+			photo.seek(0)
+		with Image.open(photo) as img:
 			exif = img.getexif()
 			if not exif:
 				return None
-			# Map EXIF tags
+			# Map EXIF tags (DateTimeOriginal/Digitized live in the Exif sub-IFD)
 			tag_map = {ExifTags.TAGS.get(k, k): v for k, v in exif.items()}
+			tag_map.update({ExifTags.TAGS.get(k, k): v for k, v in exif.get_ifd(ExifTags.IFD.Exif).items()})
 			for key in ("DateTimeOriginal", "DateTimeDigitized", "DateTime"):
 				val = tag_map.get(key)
 				if not val:
@@ -72,41 +122,192 @@ def _get_exif_date(photo_path: Path) -> Optional[datetime]:
 	return None
 
 
-def _best_date(photo_path: Path) -> datetime:
-	dt = _get_exif_date(photo_path)
-	if not dt:
-		dt = _find_sidecar_date(photo_path)
-	if not dt:
-		dt = datetime.fromtimestamp(photo_path.stat().st_mtime, tz=tz.tzlocal())
-	return dt
-
-
-def _ensure_unique_path(dest_dir: Path, filename: str) -> Path:
-	target = dest_dir / filename
-	if not target.exists():
-		return target
-	stem = Path(filename).stem
-	suffix = Path(filename).suffix
-	counter = 2
-	while True:
-		candidate = dest_dir / f"{stem}-{counter}{suffix}"
-		if not candidate.exists():
+def _get_video_date(video: Union[Path, BinaryIO]) -> Optional[datetime]:
+	dt = read_video_date(video)
+	return dt.astimezone(tz.tzlocal()) if dt else None
+
+
+def _get_embedded_date(media: Union[Path, BinaryIO], name: str) -> Tuple[Optional[datetime], str]:
+	# Date stored in the file itself and where it came from; name only picks the reader
+	ext = os.path.splitext(name)[1].lower()
+	if ext in VIDEO_EXTS:
+		return (_get_video_date(media) if ext in _ISOBMFF_VIDEO_EXTS else None, "container")
+	return (_get_exif_date(media), "exif")
+
+
+def _resolve_date(photo_path: Path, sidecars: Optional[SidecarIndex] = None) -> Tuple[datetime, str]:
+	dt, source = _get_embedded_date(photo_path, photo_path.name)
+	if dt:
+		return (dt, source)
+	dt = _find_sidecar_date(photo_path, sidecars)
+	if dt:
+		return (dt, "sidecar")
+	return (datetime.fromtimestamp(photo_path.stat().st_mtime, tz=tz.tzlocal()), "mtime")
+
+
+def _best_date(photo_path: Path, sidecars: Optional[SidecarIndex] = None) -> datetime:
+	return _resolve_date(photo_path, sidecars)[0]
+
+
+def _resolve_batch(items: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, Optional[datetime], str]]:
+	# Runs in a worker process. items: (path, sidecar path looked up by the parent).
+	# Returns (path, date, source); when date is None, source holds the error.
+	out: List[Tuple[str, Optional[datetime], str]] = []
+	for path, sidecar in items:
+		p = Path(path)
+		try:
+			dt, source = _get_embedded_date(p, p.name)
+			if not dt and sidecar:
+				dt, source = _read_sidecar_date(Path(sidecar)), "sidecar"
+			if not dt:
+				dt, source = datetime.fromtimestamp(p.stat().st_mtime, tz=tz.tzlocal()), "mtime"
+			out.append((path, dt, source))
+		except Exception as e:
+			out.append((path, None, str(e)))
+	return out
+
+
+class _KnownDate:
+	# Resolver stand-in for a date that was already worked out (process engine, cache hit)
+	def __init__(self, dt: datetime, source: str) -> None:
+		self.result = (dt, source)
+
+	def resolve(self, path: Path) -> Tuple[datetime, str]:
+		return self.result
+
+
+class DateResolver:
+	# Per-run date lookup: sidecar index plus the optional on-disk cache of earlier results
+	def __init__(self, sidecars: Optional[SidecarIndex] = None, cache: Optional[DateCache] = None) -> None:
+		self.sidecars = sidecars
+		self.cache = cache
+
+	def resolve(self, path: Path) -> Tuple[datetime, str]:
+		if self.cache is None:
+			return _resolve_date(path, self.sidecars)
+		st = path.stat()
+		key = os.path.abspath(path)
+		hit = self.cache.get(key, st.st_size, st.st_mtime_ns)
+		if hit:
+			return hit
+		dt, source = _resolve_date(path, self.sidecars)
+		self.cache.put(key, st.st_size, st.st_mtime_ns, dt, source)
+		return (dt, source)
+
+	def cached(self, path: Path) -> Optional[Tuple[datetime, str]]:
+		if self.cache is None:
+			return None
+		st = path.stat()
+		return self.cache.get(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+	def store(self, path: Path, dt: datetime, source: str) -> None:
+		if self.cache is not None:
+			st = path.stat()
+			self.cache.put(os.path.abspath(path), st.st_size, st.st_mtime_ns, dt, source)
+
+
+def _date_subdir(dest_dir: Path, dt: datetime) -> Path:
+	return dest_dir / f"{dt.year:04d}" / f"{dt.month:02d}" / f"{dt.day:02d}"
+
+
+def _placed_before(path: Path, subdir: Path, mode: str) -> Optional[Path]:
+	# Modes that keep the source see the same files again on a rerun. Try the name and the
+	# "-N" names a registry would have given it, up to the first one that does not exist.
+	stem, suffix = os.path.splitext(path.name)
+	candidate, counter = subdir / path.name, 2
+	while os.path.lexists(candidate):
+		if already_placed(path, candidate, mode):
 			return candidate
+		candidate = subdir / f"{stem}-{counter}{suffix}"
 		counter += 1
+	return None
 
 
-def _move_one(path: Path, dest_dir: Path) -> Tuple[str, int]:
-	dt = _best_date(path)
-	year = f"{dt.year:04d}"
-	month = f"{dt.month:02d}"
-	day = f"{dt.day:02d}"
-	subdir = dest_dir / year / month / day
+def _place(path: Path, dest_dir: Path, resolver: Optional[DateResolver] = None, names: Optional[NameRegistry] = None, mode: str = MODE_MOVE) -> Tuple[Path, int, bool]:
+	# Returns (target, size, placed by an earlier run)
+	dt = resolver.resolve(path)[0] if resolver else _best_date(path)
+	subdir = _date_subdir(dest_dir, dt)
 	subdir.mkdir(parents=True, exist_ok=True)
-	target_name = path.name
-	target_path = _ensure_unique_path(subdir, target_name)
 	size_bytes = path.stat().st_size
-	shutil.move(str(path), str(target_path))
-	return (target_name, size_bytes)
+	if mode != MODE_MOVE:
+		existing = _placed_before(path, subdir, mode)
+		if existing is not None:
+			return (existing, size_bytes, True)
+	target_path = (names or NameRegistry()).reserve(subdir, path.name)
+	place_file(path, target_path, mode)
+	return (target_path, size_bytes, False)
+
+
+def _move_one(path: Path, dest_dir: Path, resolver: Optional[DateResolver] = None, names: Optional[NameRegistry] = None, mode: str = MODE_MOVE) -> Tuple[str, int]:
+	_target, size_bytes, _skipped = _place(path, dest_dir, resolver, names, mode)
+	return (path.name, size_bytes)
+
+
+def _move_with_duplicates(path: Path, dest_dir: Path, duplicates: List[Path], album_links: bool, resolver: Optional[DateResolver] = None, names: Optional[NameRegistry] = None, mode: str = MODE_MOVE) -> Tuple[str, int]:
+	# Only the kept copy is placed; the other copies become hardlinks under Albums/<album> and,
+	# when moving, are removed from the source tree
+	names = names or NameRegistry()
+	target_path, size_bytes, skipped = _place(path, dest_dir, resolver, names, mode)
+	for dup in duplicates:
+		try:
+			# A file an earlier run placed already has its album links
+			if album_links and not skipped and not is_year_folder(dup.parent.name):
+				album_dir = dest_dir / ALBUMS_DIRNAME / dup.parent.name
+				album_dir.mkdir(parents=True, exist_ok=True)
+				os.link(target_path, names.reserve(album_dir, dup.name))
+			if mode == MODE_MOVE:
+				dup.unlink()
+		except OSError as e:
+			console.print(f"[yellow]Could not handle duplicate {dup}: {e}[/]")
+	return (path.name, size_bytes)
+
+
+def _is_media(name: str) -> bool:
+	return os.path.splitext(name)[1].lower() in MEDIA_EXTS
+
+
+def _stream_media(source_dir: Path, sidecars: SidecarIndex, exclude: Iterable[Path] = ()) -> Iterator[List[Path]]:
+	# Media per folder, as the walk finds them; each folder's sidecars are indexed before
+	# its photos are handed out (Takeout keeps a sidecar next to its photo)
+	for batch in walk_batches(source_dir, want=_is_media, exclude=exclude):
+		sidecars.add_folder(batch.path, batch.names)
+		if batch.entries:
+			yield [Path(e.path) for e in batch.entries]
+
+
+def _scan_sources(
+	source_dir: Path,
+	progress_cb: Optional[ProgressCallback] = None,
+	max_workers: Optional[int] = None,
+	dedupe: bool = False,
+	exclude: Iterable[Path] = (),
+) -> Tuple[List[Path], SidecarIndex, Dict[Path, List[Path]]]:
+	# One full scan finds the media and indexes every sidecar JSON next to them;
+	# exclude keeps a library nested in the source tree out of it
+	all_files: List[Path] = []
+	sizes: Dict[Path, int] = {}
+	sidecars = SidecarIndex()
+	for batch in walk_batches(source_dir, want=_is_media, max_workers=max_workers, exclude=exclude):
+		sidecars.add_folder(batch.path, batch.names)
+		for e in batch.entries:
+			p = Path(e.path)
+			all_files.append(p)
+			sizes[p] = e.stat().st_size
+	duplicates: Dict[Path, List[Path]] = {}
+	if dedupe and all_files:
+		# Takeout ships one copy per album the photo is in; keep a single physical copy
+		dropped = set()
+		for group in find_duplicates(all_files, max_workers=max_workers, sizes=sizes):
+			keeper, others = pick_keeper(group)
+			duplicates[keeper] = others
+			dropped.update(others)
+		if dropped:
+			saved = sum(sizes[p] for p in dropped)
+			console.print(f"Found {len(dropped)} duplicate copies ({format_bytes(saved)}).")
+			if progress_cb:
+				progress_cb({"phase": "organize", "event": "duplicates", "duplicate_files": len(dropped), "bytes_saved": saved})
+			all_files = [p for p in all_files if p not in dropped]
+	return all_files, sidecars, duplicates
 
 
 def organize_photos(
@@ -114,19 +315,18 @@ def organize_photos(
 	dest_dir: Path,
 	progress_cb: Optional[ProgressCallback] = None,
 	max_workers: Optional[int] = None,
+	dedupe: bool = False,
+	album_links: bool = False,
+	use_cache: bool = True,
+	mode: str = MODE_MOVE,
+	engine: str = ENGINE_THREAD,
 ) -> None:
 	source_dir = Path(source_dir)
 	dest_dir = Path(dest_dir)
 	dest_dir.mkdir(parents=True, exist_ok=True)
-
-	all_files = [p for p in source_dir.rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_EXTS]
-	if progress_cb:
-		progress_cb({"phase": "organize", "event": "start", "total_files": len(all_files)})
-	if not all_files:
-		console.print("[yellow]No photos found to organize.[/]")
-		if progress_cb:
-			progress_cb({"phase": "organize", "event": "end"})
-		return
+	if engine not in ENGINES:
+		raise ValueError(f"Unknown date engine: {engine}")
+	check_mode(mode, source_dir, dest_dir)
 
 	# Determine workers
 	if max_workers is None:
@@ -135,19 +335,109 @@ def organize_photos(
 		except Exception:
 			max_workers = 2
 
+	duplicates: Dict[Path, List[Path]] = {}
+	batches: Iterable[List[Path]]
+	if dedupe:
+		# Duplicates can only be told apart once every file is known
+		all_files, sidecars, duplicates = _scan_sources(source_dir, progress_cb, max_workers, dedupe, exclude=[dest_dir])
+		batches = [all_files]
+		scanned_total: Optional[int] = len(all_files)
+	else:
+		# Work starts with the first folder; the total grows while the walk goes on
+		sidecars = SidecarIndex()
+		batches = _stream_media(source_dir, sidecars, exclude=[dest_dir])
+		scanned_total = None
+	if progress_cb:
+		progress_cb({"phase": "organize", "event": "start", "total_files": scanned_total or 0})
+
+	cache = DateCache.for_dir(dest_dir) if use_cache else None
+	resolver = DateResolver(sidecars, cache)
+	names = NameRegistry()
+
+	total = 0
 	done = 0
-	with ThreadPoolExecutor(max_workers=max_workers) as executor:
-		futures = {executor.submit(_move_one, p, dest_dir): p for p in all_files}
-		for fut in as_completed(futures):
-			try:
-				name, size_bytes = fut.result()
-				done += 1
-				if progress_cb:
-					progress_cb({"phase": "organize", "event": "file_complete", "filename": name, "file_bytes": size_bytes, "completed_files": done, "total_files": len(all_files)})
-			except Exception as e:
-				if progress_cb:
-					progress_cb({"phase": "organize", "event": "file_error", "error": str(e)})
-
-	console.print(f"[green]Organized {done} photos into {dest_dir}[/]")
+
+	def _on_done(_tag: Any, fut: Future) -> None:
+		nonlocal done
+		try:
+			name, size_bytes = fut.result()
+			done += 1
+			if progress_cb:
+				progress_cb({"phase": "organize", "event": "file_complete", "filename": name, "file_bytes": size_bytes, "completed_files": done, "total_files": total})
+		except Exception as e:
+			if progress_cb:
+				progress_cb({"phase": "organize", "event": "file_error", "error": str(e)})
+
+	def _error(name: str, error: str) -> None:
+		if progress_cb:
+			progress_cb({"phase": "organize", "event": "file_error", "filename": name, "error": error})
+
+	with ThreadPoolExecutor(max_workers=max_workers) as executor, ExitStack() as stack:
+		# Bounded: a blocked submit also stops pulling folders from the walker
+		submitter = BoundedSubmitter(executor, max_workers, _on_done)
+
+		def _submit_move(p: Path, dates: Any) -> None:
+			if p in duplicates:
+				submitter.submit(p, _move_with_duplicates, p, dest_dir, duplicates[p], album_links, dates, names, mode)
+			else:
+				submitter.submit(p, _move_one, p, dest_dir, dates, names, mode)
+
+		if engine == ENGINE_PROCESS:
+			# Dates are parsed in worker processes; the cache, the sidecar index and every
+			# move stay in this process
+			processes = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+
+			def _on_dates(_tag: Any, fut: Future) -> None:
+				try:
+					results = fut.result()
+				except Exception as e:
+					for path, _sidecar in _tag:
+						_error(os.path.basename(path), str(e))
+					return
+				for path, dt, source in results:
+					p = Path(path)
+					if dt is None:
+						_error(p.name, source)
+						continue
+					try:
+						resolver.store(p, dt, source)
+					except OSError:
+						pass
+					_submit_move(p, _KnownDate(dt, source))
+
+			date_submitter = BoundedSubmitter(processes, max_workers, _on_dates, per_worker=2)
+			chunk: List[Tuple[str, Optional[str]]] = []
+			for batch in batches:
+				total += len(batch)
+				for p in batch:
+					try:
+						hit = resolver.cached(p)
+					except OSError as e:
+						_error(p.name, str(e))
+						continue
+					if hit:
+						_submit_move(p, _KnownDate(*hit))
+						continue
+					sidecar = sidecars.lookup_path(p)
+					chunk.append((str(p), str(sidecar) if sidecar else None))
+					if len(chunk) >= DATE_BATCH:
+						date_submitter.submit(chunk, _resolve_batch, chunk)
+						chunk = []
+			if chunk:
+				date_submitter.submit(chunk, _resolve_batch, chunk)
+			date_submitter.drain()
+		else:
+			for batch in batches:
+				total += len(batch)
+				for p in batch:
+					_submit_move(p, resolver)
+		submitter.drain()
+
+	if cache is not None:
+		cache.close()
+	if not total:
+		console.print("[yellow]No photos found to organize.[/]")
+	else:
+		console.print(f"[green]Organized {done} photos into {dest_dir}[/]")
 	if progress_cb:
 		progress_cb({"phase": "organize", "event": "end"})
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import posixpath
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Callable, Dict, Any, List, Set, Tuple
+from rich.console import Console
+
+from .downloader import ENGINE_BROWSER, download_all, CancelToken
+from .httpdownload import MAX_SEGMENTS
+from .extractor import _extract_archive, _safe_target
+from .organizer import MEDIA_EXTS, DateResolver, _KnownDate, _move_one, _resolve_date
+from .datecache import DateCache
+from .utils import BoundedSubmitter, ProgressThrottle
+from .zipindex import ZipIndex
+from .sidecars import SidecarIndex
+from .uniquenames import NameRegistry
+
+console = Console()
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Sentinel that tells a stage its upstream has finished
+_DONE = None
+
+
+def _put(q: "queue.Queue[Any]", item: Any, consumer: threading.Thread) -> None:
+	# Blocking put that gives up once the consuming stage has gone away
+	while consumer.is_alive():
+		try:
+			q.put(item, timeout=0.5)
+			return
+		except queue.Full:
+			continue
+
+
+def _media_targets(index: ZipIndex, z: Path, extract_dir: Path, sidecars: SidecarIndex) -> List[Path]:
+	# Photos and videos this archive put on disk; its sidecar JSONs go into the shared index on the way
+	targets: List[Path] = []
+	for e in index.entries(z):
+		if e.is_dir:
+			continue
+		ext = posixpath.splitext(e.name)[1].lower()
+		if ext == ".json":
+			p = _safe_target(extract_dir, e.name)
+			sidecars.add(str(p.parent), p.name, p)
+		elif ext in MEDIA_EXTS:
+			p = _safe_target(extract_dir, e.name)
+			if p.exists():
+				targets.append(p)
+	return targets
+
+
+def run_pipeline(
+	url: str,
+	download_dir: Path,
+	extract_dir: Path,
+	dest_dir: Path,
+	browser: str = "chromium",
+	cancel: Optional[CancelToken] = None,
+	progress_cb: Optional[ProgressCallback] = None,
+	chrome_profile_dir: Optional[Path] = None,
+	extract_workers: Optional[int] = None,
+	organize_workers: Optional[int] = None,
+	queue_size: int = 2,
+	progress_hz: float = 5.0,
+	download_engine: str = ENGINE_BROWSER,
+	download_segments: int = MAX_SEGMENTS,
+	download_parallel: int = 1,
+) -> None:
+	# download -> extract -> organize, overlapped: every finished archive goes straight to the
+	# extract stage and every extracted archive's photos straight to the organize stage.
+	# Bounded queues between the stages push back on a stage that runs ahead.
+	download_dir = Path(download_dir)
+	extract_dir = Path(extract_dir)
+	dest_dir = Path(dest_dir)
+	for d in (download_dir, extract_dir, dest_dir):
+		d.mkdir(parents=True, exist_ok=True)
+
+	if extract_workers is None:
+		extract_workers = max(2, min(4, os.cpu_count() or 2))
+	if organize_workers is None:
+		organize_workers = max(2, min(8, os.cpu_count() or 2))
+
+	extract_q: "queue.Queue[Optional[Path]]" = queue.Queue(maxsize=max(1, queue_size))
+	organize_q: "queue.Queue[Optional[List[Path]]]" = queue.Queue(maxsize=max(1, queue_size))
+	errors: List[BaseException] = []
+	index = ZipIndex.for_dir(download_dir)
+	sidecars = SidecarIndex()
+	date_cache = DateCache.for_dir(dest_dir)
+	resolver = DateResolver(sidecars, date_cache)
+	names = NameRegistry()
+
+	def _emit(payload: Dict[str, Any]) -> None:
+		if progress_cb:
+			progress_cb(payload)
+
+	def _download_cb(payload: Dict[str, Any]) -> None:
+		_emit(payload)
+		if payload.get("event") == "file_complete" and payload.get("filename"):
+			# Blocks the download slot that finished this archive while the extractor is saturated
+			# (backpressure); both engines deliver this event off the event loop
+			_put(extract_q, download_dir / str(payload["filename"]), t_extract)
+
+	def _extract_stage() -> None:
+		seen: Set[Path] = set()
+		bytes_total = 0
+		throttle = ProgressThrottle(lambda total: _emit({"phase": "extract", "event": "bytes_progress", "bytes_done": total, "bytes_total": bytes_total}), rate_hz=progress_hz)
+
+		def _one(z: Path) -> None:
+			nonlocal bytes_total
+			if z in seen or (cancel and cancel.is_cancelled):
+				return
+			try:
+				bytes_total += index.total_size(z)
+				name, _ = _extract_archive(z, extract_dir, split_workers=extract_workers, on_bytes=throttle.add, resume=True, index=index)
+				seen.add(z)
+				throttle.flush()
+				_emit({"phase": "extract", "event": "file_complete", "archive": name, "total_files": len(seen)})
+				batch = _media_targets(index, z, extract_dir, sidecars)
+				if batch:
+					_put(organize_q, batch, t_organize)
+			except Exception as e:
+				_emit({"phase": "extract", "event": "file_error", "archive": z.name, "error": str(e)})
+
+		try:
+			# Archives left over from an earlier session go first
+			for z in sorted(download_dir.glob("*.zip")):
+				_one(z)
+			while True:
+				z = extract_q.get()
+				if z is _DONE:
+					break
+				_one(z)
+		except BaseException as e:
+			errors.append(e)
+		finally:
+			_put(organize_q, _DONE, t_organize)
+			_emit({"phase": "extract", "event": "end"})
+
+	def _organize_stage() -> None:
+		done = 0
+		total = 0
+		# Takeout often puts a photo and its JSON in different parts: a file with no date of
+		# its own and no sidecar indexed yet waits until every archive has been extracted
+		deferred: List[Path] = []
+
+		def _organize_one(p: Path, final: bool) -> Optional[Tuple[str, int]]:
+			hit = resolver.cached(p)
+			dt, source = hit if hit else _resolve_date(p, sidecars)
+			if source == "mtime" and not final:
+				return None
+			if not hit:
+				resolver.store(p, dt, source)
+			return _move_one(p, dest_dir, _KnownDate(dt, source), names)
+
+		def _on_done(tag: Path, fut: Future) -> None:
+			nonlocal done
+			try:
+				result = fut.result()
+				if result is None:
+					deferred.append(tag)
+					return
+				name, size_bytes = result
+				done += 1
+				_emit({"phase": "organize", "event": "file_complete", "filename": name, "file_bytes": size_bytes, "completed_files": done, "total_files": total})
+			except Exception as e:
+				_emit({"phase": "organize", "event": "file_error", "error": str(e)})
+
+		try:
+			with ThreadPoolExecutor(max_workers=organize_workers) as executor:
+				submitter = BoundedSubmitter(executor, organize_workers, _on_done)
+				while True:
+					batch = organize_q.get()
+					if batch is _DONE:
+						break
+					total += len(batch)
+					for p in batch:
+						submitter.submit(p, _organize_one, p, False)
+				submitter.drain()
+				if deferred:
+					console.print(f"Organizing {len(deferred)} files that had no date until all parts were in")
+					for p in deferred:
+						submitter.submit(p, _organize_one, p, True)
+					submitter.drain()
+		except BaseException as e:
+			errors.append(e)
+		finally:
+			_emit({"phase": "organize", "event": "end"})
+
+	_emit({"phase": "extract", "event": "start", "total_files": 0})
+	_emit({"phase": "organize", "event": "start", "total_files": 0})
+	t_extract = threading.Thread(target=_extract_stage, name="pipeline-extract", daemon=True)
+	t_organize = threading.Thread(target=_organize_stage, name="pipeline-organize", daemon=True)
+	t_extract.start()
+	t_organize.start()
+	try:
+		asyncio.run(download_all(url, download_dir, browser, cancel=cancel, resume=True, progress_cb=_download_cb, chrome_profile_dir=chrome_profile_dir, engine=download_engine, segments=download_segments, parallel=download_parallel, progress_hz=progress_hz))
+	finally:
+		_put(extract_q, _DONE, t_extract)
+		t_extract.join()
+		t_organize.join()
+		index.close()
+		date_cache.close()
+	if errors:
+		raise errors[0]
+	console.print(f"[green]Pipeline finished: library at {dest_dir}[/]")
@@ -8,6 +8,10 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 
+# High-frequency progress ticks are for live UI only and are not kept in the report
+TRANSIENT_EVENTS = {"bytes_progress"}
+
+
 @dataclass
 class ReportEvent:
 	timestamp: datetime
@@ -28,6 +32,8 @@ class SessionReport:
 	def add_event(self, payload: Dict[str, Any], *, ts: Optional[datetime] = None) -> None:
 		phase = payload.get("phase") or ""
 		event = payload.get("event") or ""
+		if event in TRANSIENT_EVENTS:
+			return
 		filename = payload.get("filename")
 		archive = payload.get("archive")
 		key = payload.get("key")
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import posixpath
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Google Takeout writes one JSON sidecar per photo, but not under a predictable name:
+#   IMG_1234.jpg            -> IMG_1234.jpg.json | IMG_1234.json
+#   IMG_1234(1).jpg         -> IMG_1234.jpg(1).json
+#   IMG_1234-edited.jpg     -> IMG_1234.jpg.json (the original's sidecar)
+#   IMG_1234.jpg            -> IMG_1234.jpg.supplemental-metadata.json (newer exports,
+#                              suffix itself often truncated: ".supplemental-metad.json")
+#   <very long name>.jpg    -> <first 46 characters>.json
+#   IMG_1234.MP4 (live)     -> IMG_1234.HEIC.json
+# SidecarIndex normalizes every JSON name once so each photo lookup is a few dict hits.
+
+SUPPLEMENTAL_SUFFIX = ".supplemental-metadata"
+EDITED_SUFFIXES = ("-edited", "-bearbeitet", "-modifié", "-editado", "-modificato", "-bewerkt", "-édité")
+TRUNCATED_MIN = 30  # Takeout only truncates names longer than this
+
+_COUNTER = re.compile(r"^(.*)\((\d+)\)$")
+
+SidecarKey = Tuple[str, int]  # (normalized media name, duplicate counter)
+
+
+def _split_counter(name: str) -> Tuple[str, int]:
+	m = _COUNTER.match(name)
+	if m:
+		return m.group(1), int(m.group(2))
+	return name, 0
+
+
+def json_key(json_name: str) -> SidecarKey:
+	base = json_name[:-len(".json")] if json_name.lower().endswith(".json") else json_name
+	base, counter = _split_counter(base)
+	dot = base.rfind(".")
+	if dot > 0 and SUPPLEMENTAL_SUFFIX.startswith(base[dot:].lower()):
+		base = base[:dot]
+	return base, counter
+
+
+def media_keys(media_name: str) -> List[SidecarKey]:
+	stem, ext = posixpath.splitext(media_name)
+	stem, counter = _split_counter(stem)
+	keys: List[SidecarKey] = [(stem + ext, counter), (stem, counter)]
+	lower = stem.lower()
+	for suffix in EDITED_SUFFIXES:
+		if lower.endswith(suffix):
+			original = stem[:-len(suffix)]
+			keys.extend([(original + ext, counter), (original, counter)])
+			break
+	return keys
+
+
+class SidecarIndex:
+	def __init__(self) -> None:
+		# folder -> key -> sidecar reference (a Path, or an (archive, entry) pair for ZIPs)
+		self._by_dir: Dict[str, Dict[SidecarKey, Any]] = {}
+		# folder -> (key without extension, counter) -> reference; for live-photo videos
+		self._by_stem: Dict[str, Dict[SidecarKey, Any]] = {}
+
+	def __len__(self) -> int:
+		return sum(len(v) for v in self._by_dir.values())
+
+	def add(self, folder: str, json_name: str, ref: Any) -> None:
+		key = json_key(json_name)
+		self._by_dir.setdefault(folder, {}).setdefault(key, ref)
+		stem = posixpath.splitext(key[0])[0]
+		if stem != key[0]:
+			self._by_stem.setdefault(folder, {}).setdefault((stem, key[1]), ref)
+
+	def lookup(self, folder: str, media_name: str) -> Optional[Any]:
+		keys = self._by_dir.get(folder)
+		if not keys:
+			return None
+		candidates = media_keys(media_name)
+		for k in candidates:
+			ref = keys.get(k)
+			if ref is not None:
+				return ref
+		# Truncated sidecar names: longest prefix first
+		name, counter = candidates[0]
+		for n in range(len(name) - 1, TRUNCATED_MIN - 1, -1):
+			ref = keys.get((name[:n], counter))
+			if ref is not None:
+				return ref
+		stems = self._by_stem.get(folder)
+		if stems:
+			return stems.get(candidates[1])
+		return None
+
+	def add_folder(self, dirpath: str, names: Iterable[str]) -> None:
+		for name in names:
+			if name.lower().endswith(".json"):
+				self.add(str(Path(dirpath)), name, Path(dirpath) / name)
+
+	def lookup_path(self, photo_path: Path) -> Optional[Path]:
+		return self.lookup(str(photo_path.parent), photo_path.name)
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import json
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Callable, Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dateutil import tz
+from rich.console import Console
+
+from .extractor import ExtractJournal, _file_crc32, _iter_zip_files
+from .zipindex import ZipIndex, IndexEntry
+from .sidecars import SidecarIndex
+from .organizer import MEDIA_EXTS, _date_subdir, _get_embedded_date, _parse_sidecar_date
+from .uniquenames import NameRegistry
+
+console = Console()
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# (archive path, entry name) pointing at a single member of the archive set
+EntryRef = Tuple[Path, str]
+
+COPY_BUFFER = 1024 * 1024
+
+# Entries are inflated here (inside the library, so the final move is a rename) and only
+# renamed into their day folder once complete
+INCOMING_DIRNAME = ".incoming"
+# Next to each ZIP; separate from the extract journal, which tracks the Extracted folder
+JOURNAL_SUFFIX = ".direct.journal"
+
+
+def _scan_archives(archives: List[Path], index: ZipIndex) -> Tuple[Dict[Path, List[IndexEntry]], SidecarIndex]:
+	# One central-directory pass: media entries per archive + every JSON entry across the set
+	media: Dict[Path, List[IndexEntry]] = {}
+	sidecars = SidecarIndex()
+	for z in archives:
+		try:
+			items: List[IndexEntry] = []
+			for e in index.entries(z):
+				if e.is_dir:
+					continue
+				ext = posixpath.splitext(e.name)[1].lower()
+				if ext in MEDIA_EXTS:
+					items.append(e)
+				elif ext == ".json":
+					folder, fname = posixpath.split(e.name)
+					sidecars.add(folder, fname, (z, e.name))
+			media[z] = items
+		except Exception as e:
+			console.print(f"[red]Could not read {z.name}: {e}[/]")
+	return media, sidecars
+
+
+def _entry_sidecar_date(name: str, sidecars: SidecarIndex, handles: Dict[Path, zipfile.ZipFile]) -> Optional[datetime]:
+	folder, fname = posixpath.split(name)
+	ref: Optional[EntryRef] = sidecars.lookup(folder, fname)
+	if not ref:
+		return None
+	archive, member = ref
+	try:
+		zf = handles.get(archive)
+		if zf is None:
+			zf = zipfile.ZipFile(archive, 'r')
+			handles[archive] = zf
+		return _parse_sidecar_date(json.loads(zf.read(member).decode("utf-8")))
+	except Exception:
+		return None
+
+
+def _entry_best_date(tmp_path: Path, info: zipfile.ZipInfo, sidecars: SidecarIndex, handles: Dict[Path, zipfile.ZipFile]) -> datetime:
+	# Read from the copy already on disk: seeking inside a deflated entry (an MP4 whose moov
+	# sits after mdat) would inflate the whole video a second time
+	dt, _ = _get_embedded_date(tmp_path, info.filename)
+	if not dt:
+		dt = _entry_sidecar_date(info.filename, sidecars, handles)
+	if not dt:
+		try:
+			dt = datetime(*info.date_time, tzinfo=tz.tzlocal())
+		except Exception:
+			dt = datetime.now(tz=tz.tzlocal())
+	return dt
+
+
+def _same_file(path: Path, info: zipfile.ZipInfo) -> bool:
+	# Name and size alone are not enough: distinct photos often share both
+	try:
+		return path.stat().st_size == info.file_size and _file_crc32(path) == info.CRC
+	except OSError:
+		return False
+
+
+def _written_before(subdir: Path, filename: str, info: zipfile.ZipInfo) -> Optional[Path]:
+	# A run that stopped before journaling may have written the entry under its name or
+	# under a "-N" name from the registry; try each up to the first one that does not exist
+	stem, suffix = os.path.splitext(filename)
+	candidate, counter = subdir / filename, 2
+	while os.path.lexists(candidate):
+		if _same_file(candidate, info):
+			return candidate
+		candidate = subdir / f"{stem}-{counter}{suffix}"
+		counter += 1
+	return None
+
+
+def _stream_archive(
+	z: Path,
+	entries: List[IndexEntry],
+	dest_dir: Path,
+	sidecars: SidecarIndex,
+	names: NameRegistry,
+	on_file: Callable[[str, int], None],
+	on_error: Callable[[str, Exception], None],
+) -> Tuple[str, int]:
+	# Every entry is inflated once into INCOMING_DIRNAME, dated from that file, then renamed
+	# into its day folder; a failed copy never leaves a partial file in the library. The
+	# journal maps finished entries to their library path so a rerun skips them.
+	written = 0
+	handles: Dict[Path, zipfile.ZipFile] = {}
+	incoming = dest_dir / INCOMING_DIRNAME
+	incoming.mkdir(parents=True, exist_ok=True)
+	journal = ExtractJournal(z.with_name(z.name + JOURNAL_SUFFIX), z, dest_dir, "direct")
+	journal.load()
+	journal.open()
+	try:
+		with zipfile.ZipFile(z, 'r') as zf:
+			handles[z] = zf
+			for e in entries:
+				target_name = posixpath.basename(e.name)
+				tmp_path: Optional[Path] = None
+				try:
+					info = zf.getinfo(e.name)
+					done_at = journal.targets.get(info.filename)
+					if done_at and journal.is_done(info, dest_dir / done_at):
+						written += 1
+						on_file(target_name, info.file_size)
+						continue
+					fd, tmp_name = tempfile.mkstemp(suffix=".part", dir=incoming)
+					tmp_path = Path(tmp_name)
+					with zf.open(info) as src, os.fdopen(fd, "wb") as dst:
+						shutil.copyfileobj(src, dst, COPY_BUFFER)
+					dt = _entry_best_date(tmp_path, info, sidecars, handles)
+					subdir = _date_subdir(dest_dir, dt)
+					subdir.mkdir(parents=True, exist_ok=True)
+					existing = _written_before(subdir, target_name, info)
+					if existing is not None:
+						tmp_path.unlink()
+						target_path = existing
+					else:
+						target_path = names.reserve(subdir, target_name)
+						os.replace(tmp_path, target_path)
+					tmp_path = None
+					journal.mark_done(info, os.path.relpath(target_path, dest_dir))
+				except Exception as e:
+					if tmp_path is not None:
+						tmp_path.unlink(missing_ok=True)
+					on_error(target_name, e)
+					continue
+				written += 1
+				on_file(target_name, info.file_size)
+	finally:
+		journal.close()
+		handles.pop(z, None)
+		for h in handles.values():
+			try:
+				h.close()
+			except Exception:
+				pass
+	return (z.name, written)
+
+
+def stream_to_library(
+	download_dir: Path,
+	dest_dir: Path,
+	progress_cb: Optional[ProgressCallback] = None,
+	max_workers: Optional[int] = None,
+) -> None:
+	# Extract + organize in one pass: each photo is written once, straight into Year/Month/Day
+	download_dir = Path(download_dir)
+	dest_dir = Path(dest_dir)
+	dest_dir.mkdir(parents=True, exist_ok=True)
+
+	archives = list(_iter_zip_files(download_dir))
+	with ZipIndex.for_dir(download_dir) as index:
+		media, sidecars = _scan_archives(archives, index)
+	total_files = sum(len(v) for v in media.values())
+	if progress_cb:
+		progress_cb({"phase": "organize", "event": "start", "total_files": total_files})
+	if not total_files:
+		console.print("[yellow]No photos found in ZIP files.[/]")
+		if progress_cb:
+			progress_cb({"phase": "organize", "event": "end"})
+		return
+
+	# Determine workers
+	if max_workers is None:
+		try:
+			max_workers = max(2, min(4, os.cpu_count() or 2))
+		except Exception:
+			max_workers = 2
+
+	done = 0
+	lock = threading.Lock()
+	names = NameRegistry()
+
+	def _on_file(name: str, size_bytes: int) -> None:
+		nonlocal done
+		with lock:
+			done += 1
+			completed = done
+		if progress_cb:
+			progress_cb({"phase": "organize", "event": "file_complete", "filename": name, "file_bytes": size_bytes, "completed_files": completed, "total_files": total_files})
+
+	def _on_error(name: str, e: Exception) -> None:
+		if progress_cb:
+			progress_cb({"phase": "organize", "event": "file_error", "filename": name, "error": str(e)})
+
+	with ThreadPoolExecutor(max_workers=max_workers) as executor:
+		futures = {executor.submit(_stream_archive, z, entries, dest_dir, sidecars, names, _on_file, _on_error): z for z, entries in media.items() if entries}
+		for fut in as_completed(futures):
+			z = futures[fut]
+			try:
+				fut.result()
+				if progress_cb:
+					progress_cb({"phase": "extract", "event": "file_complete", "archive": z.name})
+			except Exception as e:
+				if progress_cb:
+					progress_cb({"phase": "extract", "event": "file_error", "archive": z.name, "error": str(e)})
+
+	try:
+		(dest_dir / INCOMING_DIRNAME).rmdir()
+	except OSError:
+		pass
+	console.print(f"[green]Organized {done} photos from {len(archives)} archives into {dest_dir}[/]")
+	if progress_cb:
+		progress_cb({"phase": "organize", "event": "end"})
@@ -30,10 +30,14 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtGui import QIcon, QPixmap, QColor, QAction, QCloseEvent
 
-from .downloader import download_all, CancelToken
+from .downloader import DOWNLOAD_ENGINES, download_all, CancelToken
+from .httpdownload import MAX_SEGMENTS
 from .extractor import extract_all
-from .organizer import organize_photos
-from .utils import format_bytes, format_duration, estimate_eta_from_counts, estimate_eta_from_bytes, set_process_priority, set_language, t
+from .organizer import ENGINES, organize_photos
+from .fileops import OUTPUT_MODES
+from .streamer import stream_to_library
+from .pipeline import run_pipeline
+from .utils import format_bytes, format_duration, estimate_eta_from_counts, estimate_eta_from_bytes, estimate_eta_from_rate, ThroughputMeter, set_process_priority, set_language, t
 from .report import SessionReport
 from .updater import get_latest_release, open_releases_page
 from .branding import APP_NAME, APP_VERSION, GITHUB_OWNER, GITHUB_REPO, WINDOW_TITLE
@@ -154,12 +158,35 @@ class MainWindow(QMainWindow):
 		self.btn_download = QPushButton(t("download_archives"))
 		self.btn_pause = QPushButton(t("pause"))
 		self.btn_pause.setEnabled(False)
+		self.btn_pipeline = QPushButton(t("run_pipeline"))
+		self.btn_pipeline.setToolTip("Extract each archive as soon as it is downloaded and organize it right after")
 		row.addWidget(self.btn_download)
+		row.addWidget(self.btn_pipeline)
 		row.addWidget(self.btn_pause)
 		layout.addLayout(row)
 		self.btn_download.clicked.connect(self.start_download)
+		self.btn_pipeline.clicked.connect(self.start_pipeline)
 		self.btn_pause.clicked.connect(self.pause_download)
 
+		row2 = QHBoxLayout()
+		self.btn_extract = QPushButton(t("extract_zips"))
+		self.btn_organize = QPushButton(t("organize_photos"))
+		self.chk_direct = QCheckBox(t("direct_to_library"))
+		self.chk_direct.setToolTip("Write photos from the ZIPs straight into the final folder, skipping the Extracted folder")
+		row2.addWidget(self.btn_extract)
+		row2.addWidget(self.btn_organize)
+		row2.addWidget(self.chk_direct)
+		self.chk_media_only = QCheckBox(t("media_only"))
+		self.chk_media_only.setToolTip("Skip HTML pages, album metadata and other files that are not photos or videos inside the ZIPs")
+		row2.addWidget(self.chk_media_only)
+		self.chk_dedupe = QCheckBox(t("dedupe"))
+		self.chk_dedupe.setToolTip("Takeout repeats a photo in every album folder; keep one copy and hardlink it under Albums")
+		row2.addWidget(self.chk_dedupe)
+		layout.addLayout(row2)
+		self.btn_extract.clicked.connect(self.start_extract)
+		self.btn_organize.clicked.connect(self.start_organize)
+		self.chk_direct.stateChanged.connect(lambda _: self.btn_organize.setEnabled(not self.chk_direct.isChecked()))
+
 		# Progress labels + bars
 		self.lbl_download = QLabel("Download: 0/0 files, 0 bytes")
 		self.pb_download = QProgressBar(); self.pb_download.setRange(0, 100); self.pb_download.setValue(0)
@@ -200,6 +227,11 @@ class MainWindow(QMainWindow):
 		self._download_completed: int = 0
 		self._download_bytes: int = 0
 		self._download_start_ts: Optional[float] = None
+		# Bytes of the parts this run downloads (bytes_progress events); total may be an estimate
+		self._download_run_done: int = 0
+		self._download_run_total: Optional[int] = None
+		self._download_meter = ThroughputMeter()
+		self._extract_meter = ThroughputMeter()
 
 		self._tray: Optional[QSystemTrayIcon] = None
 		self._create_tray_icon()
@@ -214,6 +246,26 @@ class MainWindow(QMainWindow):
 		adv.addWidget(QLabel("Organize workers:"), 0, 2)
 		self.spn_organize_workers = QSpinBox(); self.spn_organize_workers.setRange(1, 32); self.spn_organize_workers.setValue(8)
 		adv.addWidget(self.spn_organize_workers, 0, 3)
+		adv.addWidget(QLabel("Output mode:"), 1, 0)
+		self.cmb_output_mode = QComboBox(); self.cmb_output_mode.addItems(list(OUTPUT_MODES))
+		self.cmb_output_mode.setToolTip("move: files leave the Extracted folder. reflink/hardlink/symlink: the library is built without copying and the Extracted folder stays as it is")
+		adv.addWidget(self.cmb_output_mode, 1, 1)
+		adv.addWidget(QLabel("Date engine:"), 1, 2)
+		self.cmb_engine = QComboBox(); self.cmb_engine.addItems(list(ENGINES))
+		self.cmb_engine.setToolTip("process: read photo dates in separate processes to use every CPU core on large libraries")
+		adv.addWidget(self.cmb_engine, 1, 3)
+		adv.addWidget(QLabel("Download engine:"), 2, 0)
+		self.cmb_download_engine = QComboBox(); self.cmb_download_engine.addItems(list(DOWNLOAD_ENGINES))
+		self.cmb_download_engine.setToolTip("http: sign in with the browser, then fetch the archives directly with its cookies (faster than the browser's download manager)")
+		adv.addWidget(self.cmb_download_engine, 2, 1)
+		adv.addWidget(QLabel("Connections per file:"), 2, 2)
+		self.spn_segments = QSpinBox(); self.spn_segments.setRange(1, 16); self.spn_segments.setValue(MAX_SEGMENTS)
+		self.spn_segments.setToolTip("http engine: large archives are fetched in byte ranges over up to this many connections")
+		adv.addWidget(self.spn_segments, 2, 3)
+		adv.addWidget(QLabel("Parallel downloads:"), 3, 0)
+		self.spn_parallel = QSpinBox(); self.spn_parallel.setRange(1, 16); self.spn_parallel.setValue(1)
+		self.spn_parallel.setToolTip("Archives downloaded at the same time; the next one starts as soon as one finishes")
+		adv.addWidget(self.spn_parallel, 3, 1)
 
 	def save_error_log(self) -> None:
 		path, _ = QFileDialog.getSaveFileName(self, "Save Error Log", "gTakeOutThis-diagnostics.txt", "Text Files (*.txt)")
@@ -330,7 +382,7 @@ class MainWindow(QMainWindow):
 			self.append_log("Please provide URL and root folder")
 			return
 		zips = Path(self.download_edit.text()); zips.mkdir(parents=True, exist_ok=True)
-		self.btn_download.setEnabled(False); self.btn_pause.setEnabled(True)
+		self.btn_download.setEnabled(False); self.btn_pipeline.setEnabled(False); self.btn_pause.setEnabled(True)
 		self._cancel_token = CancelToken(); self._download_start_ts = time.time()
 		worker = AsyncWorker(
 			download_all,
@@ -340,17 +392,45 @@ class MainWindow(QMainWindow):
 			chrome_profile_dir=(Path(self.chrome_profile_edit.text().strip()) if self.chk_use_chrome_profile.isChecked() and self.chrome_profile_edit.text().strip() else None),
 			cancel=self._cancel_token,
 			resume=True,
+			engine=self.cmb_download_engine.currentText(),
+			segments=self.spn_segments.value(),
+			parallel=self.spn_parallel.value(),
 		)
 		self._start_download_worker(worker)
 		self.hide()
 		if self._tray:
 			self._tray.showMessage("Downloading", "Downloads in progress. Click to show/hide.", QSystemTrayIcon.Information, 2000)
 
+	def start_pipeline(self) -> None:
+		url = self.url_edit.text().strip()
+		root = Path(self.root_edit.text().strip()) if self.root_edit.text().strip() else None
+		if not url or not root:
+			self.append_log("Please provide URL and root folder")
+			return
+		self.btn_download.setEnabled(False); self.btn_pipeline.setEnabled(False); self.btn_pause.setEnabled(True)
+		self._cancel_token = CancelToken(); self._download_start_ts = time.time()
+		worker = Worker(
+			run_pipeline,
+			url,
+			download_dir=Path(self.download_edit.text()),
+			extract_dir=Path(self.extract_dst_edit.text()),
+			dest_dir=Path(self.org_dst_edit.text()),
+			browser=self.browser_combo.currentText(),
+			chrome_profile_dir=(Path(self.chrome_profile_edit.text().strip()) if self.chk_use_chrome_profile.isChecked() and self.chrome_profile_edit.text().strip() else None),
+			cancel=self._cancel_token,
+			extract_workers=self.spn_extract_workers.value(),
+			organize_workers=self.spn_organize_workers.value(),
+			download_engine=self.cmb_download_engine.currentText(),
+			download_segments=self.spn_segments.value(),
+			download_parallel=self.spn_parallel.value(),
+		)
+		self._start_download_worker(worker)
+
 	def pause_download(self) -> None:
 		if self._cancel_token:
 			self._cancel_token.cancel(); self.append_log("Paused. You can close the app and resume later.")
 
-	def _start_download_worker(self, worker: AsyncWorker) -> None:
+	def _start_download_worker(self, worker: QObject) -> None:
 		thread = QThread(self); self._download_thread = thread; self._download_worker = worker
 		worker.moveToThread(thread)
 		thread.started.connect(worker.run)
@@ -362,7 +442,7 @@ class MainWindow(QMainWindow):
 		thread.start()
 
 	def _on_download_finished(self, ok: bool, msg: str) -> None:
-		self.btn_download.setEnabled(True); self.btn_pause.setEnabled(False)
+		self.btn_download.setEnabled(True); self.btn_pipeline.setEnabled(True); self.btn_pause.setEnabled(False)
 		self._cancel_token = None; self._download_start_ts = None
 		self._tray_show()
 		if self._tray:
@@ -376,7 +456,11 @@ class MainWindow(QMainWindow):
 		if not src or not dst:
 			self.append_log("Please choose a root folder first")
 			return
-		worker = Worker(extract_all, src, dst, max_workers=self.spn_extract_workers.value())
+		if self.chk_direct.isChecked():
+			final = Path(self.org_dst_edit.text().strip())
+			worker = Worker(stream_to_library, src, final, max_workers=self.spn_extract_workers.value())
+		else:
+			worker = Worker(extract_all, src, dst, max_workers=self.spn_extract_workers.value(), media_only=self.chk_media_only.isChecked())
 		self._start_worker(worker); worker.progress.connect(self._on_progress)
 
 	def start_organize(self) -> None:
@@ -385,7 +469,8 @@ class MainWindow(QMainWindow):
 		if not src or not dst:
 			self.append_log("Please choose a root folder first")
 			return
-		worker = Worker(organize_photos, src, dst, max_workers=self.spn_organize_workers.value())
+		dedupe = self.chk_dedupe.isChecked()
+		worker = Worker(organize_photos, src, dst, max_workers=self.spn_organize_workers.value(), dedupe=dedupe, album_links=dedupe, mode=self.cmb_output_mode.currentText(), engine=self.cmb_engine.currentText())
 		self._start_worker(worker); worker.progress.connect(self._on_progress)
 
 	def _start_worker(self, worker: QObject) -> None:
@@ -408,14 +493,32 @@ class MainWindow(QMainWindow):
 				self._download_completed = payload.get("completed_files", 0)
 				self._download_bytes = payload.get("bytes_completed", 0) or 0
 				self._download_start_ts = self._download_start_ts or time.time()
+				self._download_run_done = 0
+				self._download_run_total = None
+				self._download_meter.reset()
 			elif payload.get("event") in {"file_complete", "file_skipped"}:
 				self._download_completed = payload.get("completed_files", self._download_completed)
 				self._download_bytes = payload.get("bytes_completed", self._download_bytes) or self._download_bytes
+			elif payload.get("event") == "bytes_progress":
+				self._download_run_done = payload.get("bytes_done", 0) or 0
+				self._download_run_total = payload.get("bytes_total")
+				# Speed from network bytes only, so resumed data does not show up as a burst
+				self._download_meter.update(payload.get("bytes_transferred", self._download_run_done) or 0)
 			elapsed = 0.0 if not self._download_start_ts else (time.time() - self._download_start_ts)
-			eta_items = estimate_eta_from_counts(self._download_completed, self._download_total, elapsed)
-			speed_str = f" at {format_bytes(int(self._download_bytes/elapsed))}/s" if elapsed > 0 and self._download_bytes > 0 else ""
-			eta_str = f", ETA {format_duration(eta_items)}" if eta_items is not None else ""
-			self.lbl_download.setText(f"Download: {self._download_completed}/{self._download_total} files, {format_bytes(self._download_bytes)}{speed_str}{eta_str}")
+			speed = int(self._download_meter.rate)
+			if speed > 0 and self._download_run_total:
+				eta = estimate_eta_from_rate(self._download_run_done, self._download_run_total, speed)
+			else:
+				eta = estimate_eta_from_counts(self._download_completed, self._download_total, elapsed)
+			if speed <= 0 and elapsed > 0:
+				speed = int(self._download_bytes / elapsed)
+			speed_str = f" at {format_bytes(speed)}/s" if speed > 0 else ""
+			eta_str = f", ETA {format_duration(eta)}" if eta is not None else ""
+			if self._download_run_total:
+				bytes_str = f"{format_bytes(self._download_run_done)}/{format_bytes(self._download_run_total)}"
+			else:
+				bytes_str = format_bytes(max(self._download_bytes, self._download_run_done))
+			self.lbl_download.setText(f"Download: {self._download_completed}/{self._download_total} files, {bytes_str}{speed_str}{eta_str}")
 			pct = 0 if self._download_total == 0 else int(100 * self._download_completed / max(1, self._download_total))
 			self.pb_download.setValue(pct)
 			self._update_tray_tooltip()
@@ -427,14 +530,21 @@ class MainWindow(QMainWindow):
 				self._extract_bytes_done = 0
 				self._extract_bytes_total = 0
 				self._extract_start_ts = time.time()
-			elif evt == "file_progress":
+				self._extract_meter.reset()
+			elif evt in {"file_progress", "bytes_progress"}:
 				self._extract_bytes_done = payload.get("bytes_done", 0)
 				self._extract_bytes_total = payload.get("bytes_total", 0)
+				self._extract_meter.update(self._extract_bytes_done)
 			elif evt == "file_complete":
 				self._extract_done = getattr(self, "_extract_done", 0) + 1
 			elapsed = max(0.0, time.time() - getattr(self, "_extract_start_ts", time.time()))
-			speed = 0 if elapsed <= 0 else int(self._extract_bytes_done / elapsed)
-			eta = estimate_eta_from_bytes(self._extract_bytes_done, max(1, self._extract_bytes_total), elapsed)
+			# Live throughput over the last few seconds; fall back to the session average early on
+			speed = int(self._extract_meter.rate)
+			if speed > 0:
+				eta = estimate_eta_from_rate(self._extract_bytes_done, self._extract_bytes_total, speed)
+			else:
+				speed = 0 if elapsed <= 0 else int(getattr(self, "_extract_bytes_done", 0) / elapsed)
+				eta = estimate_eta_from_bytes(getattr(self, "_extract_bytes_done", 0), max(1, getattr(self, "_extract_bytes_total", 0)), elapsed)
 			eta_str = f", ETA {format_duration(eta)}" if eta is not None else ""
 			self.lbl_extract.setText(
 				f"Extract: {getattr(self, '_extract_done', 0)}/{getattr(self, '_extract_total', 0)} archives, {format_bytes(getattr(self, '_extract_bytes_done', 0))}/{format_bytes(max(1, getattr(self, '_extract_bytes_total', 0)))} at {format_bytes(speed)}/s{eta_str}"
@@ -449,6 +559,7 @@ class MainWindow(QMainWindow):
 				self._org_start_ts = time.time()
 			elif evt == "file_complete":
 				self._org_done = payload.get("completed_files", self._org_done)
+				self._org_total = payload.get("total_files", self._org_total)
 			elapsed = max(0.0, time.time() - getattr(self, "_org_start_ts", time.time()))
 			eta_items = estimate_eta_from_counts(getattr(self, "_org_done", 0), max(1, getattr(self, "_org_total", 0)), elapsed)
 			eta_str = f", ETA {format_duration(eta_items)}" if eta_items is not None else ""
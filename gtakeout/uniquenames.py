@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Set
+
+
+class _DirNames:
+	def __init__(self, dest_dir: Path) -> None:
+		self.lock = threading.Lock()
+		# normcase: on Windows "IMG.JPG" and "img.jpg" are the same file
+		self.names: Set[str] = set()
+		try:
+			with os.scandir(dest_dir) as it:
+				self.names.update(os.path.normcase(e.name) for e in it)
+		except OSError:
+			pass
+		# filename -> next "-N" counter to try, so repeated collisions do not rescan 2..N
+		self.next_counter: Dict[str, int] = {}
+
+
+class NameRegistry:
+	# Hands out collision-free file names per destination directory. Each directory is
+	# listed once, on first use; after that every name is reserved in memory under a
+	# per-directory lock, so parallel workers can never pick the same target.
+	# One registry per run: it assumes nothing else writes into the destination meanwhile.
+	def __init__(self) -> None:
+		self._dirs: Dict[str, _DirNames] = {}
+		self._lock = threading.Lock()
+
+	def _dir(self, dest_dir: Path) -> _DirNames:
+		key = os.path.normcase(os.path.abspath(dest_dir))
+		entry = self._dirs.get(key)
+		if entry is None:
+			with self._lock:
+				entry = self._dirs.get(key)
+				if entry is None:
+					entry = _DirNames(dest_dir)
+					self._dirs[key] = entry
+		return entry
+
+	def reserve(self, dest_dir: Path, filename: str) -> Path:
+		d = self._dir(dest_dir)
+		with d.lock:
+			key = os.path.normcase(filename)
+			if key not in d.names:
+				d.names.add(key)
+				return Path(dest_dir) / filename
+			stem, suffix = os.path.splitext(filename)
+			counter = d.next_counter.get(key, 2)
+			while True:
+				candidate = f"{stem}-{counter}{suffix}"
+				counter += 1
+				if os.path.normcase(candidate) not in d.names:
+					break
+			d.next_counter[key] = counter
+			d.names.add(os.path.normcase(candidate))
+			return Path(dest_dir) / candidate
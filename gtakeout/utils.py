@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-from typing import Optional, Dict
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Deque, Optional, Dict, Tuple
 
 
 def format_bytes(num_bytes: int) -> str:
@@ -43,6 +48,111 @@ def estimate_eta_from_bytes(bytes_done: int, bytes_total: int, elapsed_seconds:
 		return None
 	return remaining / rate
 
+
+def estimate_eta_from_rate(bytes_done: int, bytes_total: int, rate: float) -> Optional[float]:
+	if bytes_total <= 0 or bytes_done >= bytes_total or rate <= 0:
+		return None
+	return (bytes_total - bytes_done) / rate
+
+
+class ProgressThrottle:
+	# Merges byte counts reported by many worker threads and calls emit(total)
+	# at most rate_hz times per second, so the UI signal queue never floods.
+	def __init__(self, emit: Callable[[int], None], rate_hz: float = 5.0, start: int = 0) -> None:
+		self._emit = emit
+		self._interval = 1.0 / rate_hz if rate_hz > 0 else 0.0
+		self._total = start
+		self._last_emit = 0.0
+		self._lock = threading.Lock()
+
+	@property
+	def total(self) -> int:
+		return self._total
+
+	def add(self, n: int) -> None:
+		with self._lock:
+			self._total += n
+			now = time.monotonic()
+			if now - self._last_emit < self._interval:
+				return
+			self._last_emit = now
+			total = self._total
+		self._emit(total)
+
+	def flush(self) -> None:
+		with self._lock:
+			self._last_emit = time.monotonic()
+			total = self._total
+		self._emit(total)
+
+
+class ThroughputMeter:
+	# Sliding-window rate over the last few seconds of (time, bytes) samples
+	def __init__(self, window_seconds: float = 10.0) -> None:
+		self.window_seconds = window_seconds
+		self._samples: Deque[Tuple[float, int]] = deque()
+
+	def reset(self) -> None:
+		self._samples.clear()
+
+	def update(self, bytes_done: int, now: Optional[float] = None) -> float:
+		now = time.monotonic() if now is None else now
+		self._samples.append((now, bytes_done))
+		while len(self._samples) > 2 and now - self._samples[0][0] > self.window_seconds:
+			self._samples.popleft()
+		return self.rate
+
+	@property
+	def rate(self) -> float:
+		if len(self._samples) < 2:
+			return 0.0
+		(t0, b0), (t1, b1) = self._samples[0], self._samples[-1]
+		if t1 <= t0:
+			return 0.0
+		return max(0.0, (b1 - b0) / (t1 - t0))
+
+
+# Tasks kept queued per worker by BoundedSubmitter
+IN_FLIGHT_PER_WORKER = 4
+
+
+class BoundedSubmitter:
+	# Feeds an executor without queueing the whole job list: at most `limit` tasks are in
+	# flight and submit() blocks until one finishes. Finished tasks are handed to
+	# on_done(tag, future) in the submitting thread, so progress callbacks stay on one thread.
+	def __init__(self, executor: Executor, workers: int, on_done: Callable[[Any, Future], None], per_worker: int = IN_FLIGHT_PER_WORKER) -> None:
+		self._executor = executor
+		self._on_done = on_done
+		self.limit = max(1, workers * per_worker)
+		self._finished: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+		self._in_flight = 0
+
+	@property
+	def in_flight(self) -> int:
+		return self._in_flight
+
+	def submit(self, tag: Any, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+		while self._in_flight >= self.limit:
+			self._handle(block=True)
+		fut = self._executor.submit(fn, *args, **kwargs)
+		self._in_flight += 1
+		fut.add_done_callback(lambda f: self._finished.put((tag, f)))
+		self._handle(block=False)
+
+	def _handle(self, block: bool) -> None:
+		while True:
+			try:
+				tag, fut = self._finished.get(block=block)
+			except queue.Empty:
+				return
+			block = False
+			self._in_flight -= 1
+			self._on_done(tag, fut)
+
+	def drain(self) -> None:
+		while self._in_flight:
+			self._handle(block=True)
+
 # Process priority helpers (Windows-friendly)
 
 def set_process_priority(level: str) -> None:
@@ -64,12 +174,16 @@ _STRINGS: Dict[str, Dict[str, str]] = {
 	"en": {
 		"download_archives": "Download Archives",
 		"pause": "Pause",
+		"run_pipeline": "Download + Extract + Organize",
 		"zips_folder": "ZIPs folder:",
 		"extract_to": "Extract to:",
 		"extract_zips": "Extract ZIPs",
 		"photos_folder": "Photos folder:",
 		"organize_into": "Organize into:",
 		"organize_photos": "Organize Photos",
+		"direct_to_library": "Direct to library (skip Extracted folder)",
+		"media_only": "Photos and videos only",
+		"dedupe": "Skip album duplicates",
 		"export_csv": "Export CSV Report",
 		"export_html": "Export HTML Report",
 		"summary_title": "Summary",
@@ -77,12 +191,16 @@ _STRINGS: Dict[str, Dict[str, str]] = {
 	"es": {
 		"download_archives": "Descargar archivos",
 		"pause": "Pausar",
+		"run_pipeline": "Descargar + Extraer + Organizar",
 		"zips_folder": "Carpeta de ZIPs:",
 		"extract_to": "Extraer en:",
 		"extract_zips": "Extraer ZIPs",
 		"photos_folder": "Carpeta de fotos:",
 		"organize_into": "Organizar en:",
 		"organize_photos": "Organizar fotos",
+		"direct_to_library": "Directo a la biblioteca (sin carpeta Extracted)",
+		"media_only": "Solo fotos y vídeos",
+		"dedupe": "Omitir duplicados de álbumes",
 		"export_csv": "Exportar informe CSV",
 		"export_html": "Exportar informe HTML",
 		"summary_title": "Resumen",
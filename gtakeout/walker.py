@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+
+class DirBatch(NamedTuple):
+	path: str
+	names: List[str]  # every file in the folder (sidecar JSONs included)
+	entries: List[os.DirEntry]  # the wanted files; entry.stat() is already cached
+
+
+# Marks the end of the walk on the output queue
+_END = object()
+
+
+def walk_batches(
+	root: os.PathLike,
+	want: Optional[Callable[[str], bool]] = None,
+	max_workers: Optional[int] = None,
+	buffer: int = 64,
+	exclude: Iterable[os.PathLike] = (),
+) -> Iterator[DirBatch]:
+	# Parallel os.scandir walk that yields one batch per folder as soon as that folder has
+	# been listed, so the caller can start on the first photos while the rest of the tree
+	# is still being walked. Folder order is not deterministic. Unreadable folders are skipped.
+	if max_workers is None:
+		max_workers = max(2, min(8, os.cpu_count() or 2))
+	# e.g. a library folder inside the source tree, which fills up while the walk runs
+	skip = {os.path.normcase(os.path.abspath(p)) for p in exclude}
+	out: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, buffer))
+	stop = threading.Event()
+	lock = threading.Lock()
+	pending = 0
+
+	def _put(item: Any) -> None:
+		# Blocks while the consumer is behind, gives up once it has gone away
+		while not stop.is_set():
+			try:
+				out.put(item, timeout=0.5)
+				return
+			except queue.Full:
+				continue
+
+	def _submit(executor: ThreadPoolExecutor, path: str) -> None:
+		nonlocal pending
+		if stop.is_set():
+			return
+		with lock:
+			pending += 1
+		executor.submit(_scan, executor, path)
+
+	def _scan(executor: ThreadPoolExecutor, path: str) -> None:
+		nonlocal pending
+		try:
+			if stop.is_set():
+				return
+			names: List[str] = []
+			entries: List[os.DirEntry] = []
+			subdirs: List[str] = []
+			try:
+				with os.scandir(path) as it:
+					for e in it:
+						try:
+							if e.is_dir(follow_symlinks=False):
+								if not skip or os.path.normcase(os.path.abspath(e.path)) not in skip:
+									subdirs.append(e.path)
+							elif e.is_file():
+								names.append(e.name)
+								if want is None or want(e.name):
+									e.stat()  # cached on the entry for the consumer
+									entries.append(e)
+						except OSError:
+							continue
+			except OSError:
+				return
+			for d in subdirs:
+				_submit(executor, d)
+			if names:
+				_put(DirBatch(path, names, entries))
+		finally:
+			with lock:
+				pending -= 1
+				last = pending == 0
+			if last:
+				_put(_END)
+
+	executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="walk")
+	try:
+		_submit(executor, os.fspath(root))
+		while True:
+			item = out.get()
+			if item is _END:
+				break
+			yield item
+	finally:
+		stop.set()
+		executor.shutdown(wait=True)
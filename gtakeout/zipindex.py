@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+INDEX_FILENAME = "zip_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+	id INTEGER PRIMARY KEY,
+	path TEXT UNIQUE NOT NULL,
+	size INTEGER NOT NULL,
+	mtime_ns INTEGER NOT NULL,
+	total_size INTEGER NOT NULL,
+	entry_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+	archive_id INTEGER NOT NULL REFERENCES archives(id) ON DELETE CASCADE,
+	name TEXT NOT NULL,
+	file_size INTEGER NOT NULL,
+	compress_size INTEGER NOT NULL,
+	crc INTEGER NOT NULL,
+	header_offset INTEGER NOT NULL,
+	mtime TEXT NOT NULL,
+	is_dir INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_archive ON entries(archive_id);
+"""
+
+
+class IndexEntry(NamedTuple):
+	name: str
+	file_size: int
+	compress_size: int
+	crc: int
+	header_offset: int
+	mtime: str  # "YYYY-MM-DD HH:MM:SS" from the zip entry's DOS timestamp
+	is_dir: bool
+
+	@property
+	def date_time(self) -> Tuple[int, int, int, int, int, int]:
+		dt = datetime.strptime(self.mtime, "%Y-%m-%d %H:%M:%S")
+		return (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+
+
+def _entry_from_info(info: zipfile.ZipInfo) -> IndexEntry:
+	y, mo, d, h, mi, s = info.date_time
+	return IndexEntry(
+		name=info.filename,
+		file_size=info.file_size,
+		compress_size=info.compress_size,
+		crc=info.CRC,
+		header_offset=info.header_offset,
+		mtime=f"{y:04d}-{mo:02d}-{d:02d} {h:02d}:{mi:02d}:{s:02d}",
+		is_dir=info.is_dir(),
+	)
+
+
+class ZipIndex:
+	# Persistent copy of every archive's central directory. An archive is re-read
+	# only when its size or mtime changes, so sizing, filtering, planning and resume
+	# checks on later runs never touch the ZIPs themselves.
+	def __init__(self, db_path: Path) -> None:
+		self.db_path = Path(db_path)
+		self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+		self._conn.execute("PRAGMA journal_mode=WAL")
+		self._conn.execute("PRAGMA synchronous=NORMAL")
+		self._conn.execute("PRAGMA foreign_keys=ON")
+		self._conn.executescript(_SCHEMA)
+		self._lock = threading.Lock()
+
+	@classmethod
+	def for_dir(cls, download_dir: Path) -> "ZipIndex":
+		return cls(Path(download_dir) / INDEX_FILENAME)
+
+	def close(self) -> None:
+		with self._lock:
+			self._conn.close()
+
+	def __enter__(self) -> "ZipIndex":
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self.close()
+
+	def _lookup(self, archive: Path) -> Optional[Tuple[int, int]]:
+		st = archive.stat()
+		row = self._conn.execute(
+			"SELECT id, size, mtime_ns, total_size FROM archives WHERE path = ?", (str(archive.resolve()),)
+		).fetchone()
+		if row and row[1] == st.st_size and row[2] == st.st_mtime_ns:
+			return (row[0], row[3])
+		return None
+
+	def _refresh(self, archive: Path) -> int:
+		st = archive.stat()
+		with zipfile.ZipFile(archive, 'r') as zf:
+			items = [_entry_from_info(i) for i in zf.infolist()]
+		key = str(archive.resolve())
+		with self._conn:
+			self._conn.execute("DELETE FROM archives WHERE path = ?", (key,))
+			cur = self._conn.execute(
+				"INSERT INTO archives(path, size, mtime_ns, total_size, entry_count) VALUES (?, ?, ?, ?, ?)",
+				(key, st.st_size, st.st_mtime_ns, sum(e.file_size for e in items), len(items)),
+			)
+			archive_id = int(cur.lastrowid)
+			self._conn.executemany(
+				"INSERT INTO entries(archive_id, name, file_size, compress_size, crc, header_offset, mtime, is_dir) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+				((archive_id, e.name, e.file_size, e.compress_size, e.crc, e.header_offset, e.mtime, int(e.is_dir)) for e in items),
+			)
+		return archive_id
+
+	def _archive_id(self, archive: Path) -> int:
+		found = self._lookup(archive)
+		if found:
+			return found[0]
+		return self._refresh(archive)
+
+	def total_size(self, archive: Path) -> int:
+		with self._lock:
+			archive = Path(archive)
+			found = self._lookup(archive)
+			if found:
+				return found[1]
+			archive_id = self._refresh(archive)
+			row = self._conn.execute("SELECT total_size FROM archives WHERE id = ?", (archive_id,)).fetchone()
+			return int(row[0])
+
+	def entries(self, archive: Path) -> List[IndexEntry]:
+		with self._lock:
+			archive_id = self._archive_id(Path(archive))
+			rows = self._conn.execute(
+				"SELECT name, file_size, compress_size, crc, header_offset, mtime, is_dir FROM entries WHERE archive_id = ? ORDER BY header_offset",
+				(archive_id,),
+			).fetchall()
+		return [IndexEntry(r[0], r[1], r[2], r[3], r[4], r[5], bool(r[6])) for r in rows]
@@ -1,4 +1,8 @@
+import multiprocessing
+
 from gtakeout.ui import run_gui
 
 if __name__ == "__main__":
+	# The process date engine starts worker processes from the frozen executable
+	multiprocessing.freeze_support()
 	run_gui()